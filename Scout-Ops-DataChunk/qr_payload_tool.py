@@ -0,0 +1,76 @@
+"""Reference encoder for scanner QR payloads.
+
+Turns CSV_HEADER rows (for example results.csv or generated test data) into
+QR code images in the plain CSV or compact "SOC1:" format, optionally bundling
+several matches from one tablet into a single payload ("SOB1:" when compact)
+and splitting into multi-part codes, so the scanner and the tablet app can be
+tested against known payloads.
+
+    python qr_payload_tool.py results.csv --format compact --out test_codes/
+    python qr_payload_tool.py results.csv --bundle 6 --chunk-size 300
+"""
+import argparse
+import csv
+import os
+
+import cv2
+
+from scanner_core import SCAN_FIELDS, encode_bundle, encode_compact, split_payload
+
+
+def build_payloads(rows, payload_format, chunk_size):
+    """Return the QR texts a tablet would show for one CSV row or a bundle of rows"""
+    csv_rows = [','.join(row) for row in rows]
+    payload = csv_rows[0] if len(csv_rows) == 1 else encode_bundle(csv_rows, compact=False)
+    if payload_format == "compact":
+        try:
+            payload = encode_compact(csv_rows[0]) if len(csv_rows) == 1 else encode_bundle(csv_rows)
+        except ValueError as e:
+            print(f"Falling back to plain CSV for {rows[0][:3]}: {e}")
+    return split_payload(payload, chunk_size) if chunk_size else [payload]
+
+
+def group_rows(rows, bundle_size):
+    """Group rows per tablet (alliance and station) into bundles of up to bundle_size, keeping file order"""
+    header = SCAN_FIELDS
+    alliance, station = header.index("allianceColor"), header.index("station")
+    tablets = {}
+    for row in rows:
+        tablets.setdefault((row[alliance], row[station]), []).append(row)
+    bundles = []
+    for tablet_rows in tablets.values():
+        for start in range(0, len(tablet_rows), bundle_size):
+            bundles.append(tablet_rows[start:start + bundle_size])
+    return bundles
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate scanner test QR codes from CSV rows")
+    parser.add_argument("csv_file", help="CSV file with a CSV_HEADER header row")
+    parser.add_argument("--format", choices=("plain", "compact"), default="compact")
+    parser.add_argument("--bundle", type=int, default=1, help="Put up to this many matches from one tablet in a payload")
+    parser.add_argument("--chunk-size", type=int, default=0, help="Split payloads into parts of this many characters")
+    parser.add_argument("--out", default="test_codes", help="Directory for the PNG files")
+    parser.add_argument("--scale", type=int, default=4, help="Pixels per QR module")
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    encoder = cv2.QRCodeEncoder.create()
+    header = SCAN_FIELDS
+    with open(args.csv_file, newline='') as f:
+        rows = [[record.get(field) or "" for field in header] for record in csv.DictReader(f)]
+
+    for payload_number, bundle in enumerate(group_rows(rows, max(1, args.bundle)), 1):
+        payloads = build_payloads(bundle, args.format, args.chunk_size)
+        for part, payload in enumerate(payloads, 1):
+            image = encoder.encode(payload)
+            image = cv2.resize(image, None, fx=args.scale, fy=args.scale, interpolation=cv2.INTER_NEAREST)
+            path = os.path.join(args.out, f"row{payload_number:04d}_{part}.png")
+            cv2.imwrite(path, image)
+        modules = encoder.encode(payloads[0]).shape[0]
+        print(f"Payload {payload_number}: {len(bundle)} row(s), {len(payloads)} code(s), "
+              f"{len(payloads[0])} chars, {modules} modules")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,71 +1,34 @@
-import io
 import sys
+import argparse
 import cv2
-import numpy as np
-from pyzbar.pyzbar import decode
 import os
 import datetime
 import time
-import csv
-import re
-import threading
 import platform
-import gc
-import psutil
+import threading
+import logging
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QLabel, QVBoxLayout, QPushButton, 
                             QWidget, QFileDialog, QHBoxLayout, QGridLayout, QGroupBox,
                             QComboBox, QCheckBox, QSlider, QFrame, QSplitter)
 from PyQt5.QtGui import QImage, QPixmap, QColor, QPainter, QPen, QFont
 from PyQt5.QtCore import QTimer, Qt, QRect, pyqtSignal, QThread, QUrl, QBuffer, QIODevice
 from PyQt5.QtMultimedia import QSoundEffect
-from PIL import Image, ImageEnhance, ImageOps
 import subprocess  # For opening the folder
-import warnings  # To suppress warnings
-
-# Suppress zbar warnings
-warnings.filterwarnings("ignore", category=RuntimeWarning)
-
-# Replace the get_application_path function with these functions
-def get_application_path():
-    """Get the base application path regardless of how the app is launched"""
-    if getattr(sys, 'frozen', False):
-        # Running as compiled executable
-        return os.path.dirname(sys.executable)
-    else:
-        # Running as script
-        return os.path.dirname(os.path.abspath(__file__))
-
-def get_data_directory():
-    """Get a writable directory for data storage"""
-    if platform.system() == "Windows":
-        # Use AppData folder on Windows
-        base_dir = os.path.join(os.path.expanduser("~"), "AppData", "Local", "ScoutOps")
-    else:
-        # Use home directory for other platforms
-        base_dir = os.path.join(os.path.expanduser("~"), ".scoutops")
-    
-    # Create the directory if it doesn't exist
-    os.makedirs(base_dir, exist_ok=True)
-    return base_dir
-
-# Update your directory paths to use the data directory
-SAVE_DIR = os.path.join(get_data_directory(), "scanned_data")
-os.makedirs(SAVE_DIR, exist_ok=True)
-
-# Update results path too
-RESULTS_CSV = os.path.join(get_data_directory(), "results.csv")
-
-# CSV header for reference
-CSV_HEADER = "teamNumber,scouterName,matchKey,allianceColor,eventKey,station,matchNumber,auton_CoralScoringLevel1,auton_CoralScoringLevel2,auton_CoralScoringLevel3,auton_CoralScoringLevel4,auton_LeftBarge,auton_AlgaeScoringProcessor,auton_AlgaeScoringBarge,botLocation,teleop_CoralScoringLevel1,teleop_CoralScoringLevel2,teleop_CoralScoringLevel3,teleop_CoralScoringLevel4,teleop_AlgaeScoringBarge,teleop_AlgaeScoringProcessor,teleop_AlgaePickUp,teleop_Defense,endgame_Deep_Climb,endgame_Shallow_Climb,endgame_Park,endgame_Comments"
-
-# Track which tablets have been scanned for current match
-scanned_tablets = {
-    "Red 1": False,
-    "Red 2": False,
-    "Red 3": False,
-    "Blue 1": False,
-    "Blue 2": False,
-    "Blue 3": False
+from scanner_core import (SAVE_DIR, TABLET_IDS, qr_detection_settings, get_application_path,
+                          CameraCapture, DecodeWorkerPool, RateMeter, ScanSession, parse_record, available_decoders,
+                          QUALITY_HINTS,
+                          METRICS_FILE, metrics_settings, pipeline_metrics, MemoryBudget, memory_settings,
+                          log, logging_settings, set_log_level, setup_logging, stop_logging,
+                          discover_cameras, load_camera_cache, save_camera_cache,
+                          DECODE_WORKERS, add_pipeline_arguments, settings_from_args)
+
+# Preview settings, the preview reads the frame ring on its own timer
+preview_settings = {
+    "fps": 15,                    # Preview refresh rate
+    "scale": 0.5,                 # Preview size relative to the camera frame, 1.0 for full size
+    "low_power": False,           # Low-power preview mode
+    "low_power_fps": 5,
+    "low_power_scale": 0.35,
 }
 
 # Colors for UI
@@ -85,54 +48,26 @@ UI_COLORS = {
     "divider": QColor(230, 230, 230),       # Light divider
 }
 
-# QR detection settings
-qr_detection_settings = {
-    "brightness_threshold": 160,  # Threshold for bright area detection (0-255)
-    "min_rect_size": 50,          # Minimum rectangle size in pixels
-    "max_rect_size": 500,         # Maximum rectangle size in pixels
-    "rect_aspect_ratio": 1.5,     # Maximum aspect ratio for rectangles
-    "focus_enabled": True,        # Enable/disable smart focusing
-    "highlight_potential": True,  # Highlight potential QR code areas
-}
-
 class CameraThread(QThread):
-    frame_ready = pyqtSignal(bytes)
-
-    def __init__(self, camera_index=0):
+    def __init__(self, camera_index=0, decoder_pool=None, on_activity=None):
         super().__init__()
-        self.camera_index = camera_index
-        self.running = False
-        self.capture = None
+        self.camera = CameraCapture(camera_index, decoder_pool, on_activity=on_activity)
 
     def run(self):
-        import cv2  # Import locally to avoid unnecessary overhead when not running
-        self.capture = cv2.VideoCapture(self.camera_index, cv2.CAP_DSHOW)
-        self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, 640)  # Lower resolution for faster processing
-        self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-        self.capture.set(cv2.CAP_PROP_FPS, 30)  # Higher FPS for smoother video
-        self.running = True
-
-        while self.running:
-            ret, frame = self.capture.read()
-            if ret:
-                # Convert frame to bytes for lightweight processing
-                _, buffer = cv2.imencode('.jpg', frame)
-                self.frame_ready.emit(buffer.tobytes())
-            else:
-                print(f"Error reading from camera {self.camera_index}")
-                break
-
-        self.capture.release()
+        self.camera.run()
 
     def stop(self):
-        self.running = False
+        self.camera.stop()
         self.wait()
-        if self.capture:
-            self.capture.release()
-            self.capture = None
 
 class QRCodeScannerApp(QMainWindow):
-    def __init__(self):
+    decode_results = pyqtSignal(object)
+    cameras_discovered = pyqtSignal(object)
+    status_message = pyqtSignal(str, str)
+    match_state_changed = pyqtSignal()
+    quality_hint = pyqtSignal(object, object)
+
+    def __init__(self, workers=DECODE_WORKERS):
         super().__init__()
         self.setWindowTitle("Scout Ops QR Scanner")
         self.setGeometry(100, 100, 1280, 720)
@@ -148,23 +83,48 @@ class QRCodeScannerApp(QMainWindow):
             QVBoxLayout, QHBoxLayout { spacing: 15px; margin: 15px; }
         """)
 
-        # Memory management
-        self.memory_monitor_timer = QTimer()
-        self.memory_monitor_timer.timeout.connect(self.check_memory_usage)
-        self.memory_monitor_timer.start(30000)  # Check every 30 seconds
-        
-        self.last_gc_time = time.time()
-        
-        # Limit size of history
-        self.max_history_size = 100
-        
         # State variables
-        self.available_cameras = self.scan_available_cameras()
+        # Open with the last known-good cameras, a background rescan refreshes the list
+        camera_cache = load_camera_cache()
+        if camera_cache:
+            self.available_cameras = camera_cache["cameras"]
+            last_camera = camera_cache.get("last_camera")
+        else:
+            self.available_cameras = [{"index": 0, "name": "Default Camera"}]
+            last_camera = None
+        self.rescan_thread = None
         self.active_camera_index = 0
-        self.last_match_key = None
         self.last_scan_time = 0
         self.recent_messages = []
-        self.scanned_data_history = set()
+        # setStyleSheet re-polishes the widget every call, so each look is built once and only applied on change
+        self.styles = {
+            "waiting": "color: gray;",
+            "receiving": f"color: {self.to_stylesheet_color(UI_COLORS['warning'])}; font-weight: bold;",
+            "scanned": f"color: {self.to_stylesheet_color(UI_COLORS['success'])}; font-weight: bold;",
+            "info": f"color: {self.to_stylesheet_color(UI_COLORS['text'])};",
+            "success": f"color: {self.to_stylesheet_color(UI_COLORS['success'])};",
+            "warning": f"color: {self.to_stylesheet_color(UI_COLORS['warning'])};",
+            "error": f"color: {self.to_stylesheet_color(UI_COLORS['error'])};",
+            "hint": f"color: {self.to_stylesheet_color(UI_COLORS['warning'])}; font-size: 16px; font-weight: bold;",
+        }
+        self.applied_styles = {}  # widget -> key of the style last applied
+        # Session messages can come from the scan store thread, the signal queues them to the GUI thread
+        self.status_message.connect(self.add_status_message)
+        self.session = ScanSession(notify=self.status_message.emit)
+        
+        # Frames, decode and preview buffers are reused, only caches are released when over budget
+        self.memory_budget = MemoryBudget()
+        self.memory_budget.add_release("scan caches", self.session.release_memory)
+        self.memory_monitor_timer = QTimer()
+        self.memory_monitor_timer.timeout.connect(self.check_memory_usage)
+        self.memory_monitor_timer.start(int(memory_settings["check_interval"] * 1000))
+        
+        # Frame pipeline throughput
+        self.last_frame_seq = 0
+        self.camera_scan_counts = {}
+        self.display_rate = RateMeter()
+        self.preview_buffer = None
+        self.last_rate_report = time.time()
         
         # Central widget and main layout
         self.central_widget = QWidget()
@@ -257,6 +217,24 @@ class QRCodeScannerApp(QMainWindow):
         self.highlight_checkbox.toggled.connect(self.toggle_highlight_mode)
         self.settings_layout.addWidget(self.highlight_checkbox)
         
+        # Motion gating checkbox
+        self.motion_gate_checkbox = QCheckBox("Idle When Scene Is Static")
+        self.motion_gate_checkbox.setChecked(qr_detection_settings["motion_gate_enabled"])
+        self.motion_gate_checkbox.toggled.connect(self.toggle_motion_gate)
+        self.settings_layout.addWidget(self.motion_gate_checkbox)
+        
+        # Quality gate checkbox
+        self.quality_gate_checkbox = QCheckBox("Skip Blurred Or Glared Frames")
+        self.quality_gate_checkbox.setChecked(qr_detection_settings["quality_gate_enabled"])
+        self.quality_gate_checkbox.toggled.connect(self.toggle_quality_gate)
+        self.settings_layout.addWidget(self.quality_gate_checkbox)
+        
+        # Preprocessing fallback checkbox
+        self.fallback_checkbox = QCheckBox("Retry Hard-To-Read Codes")
+        self.fallback_checkbox.setChecked(qr_detection_settings["fallback_enabled"])
+        self.fallback_checkbox.toggled.connect(self.toggle_fallback)
+        self.settings_layout.addWidget(self.fallback_checkbox)
+        
         # Brightness threshold slider
         brightness_layout = QHBoxLayout()
         brightness_layout.addWidget(QLabel("Brightness:"))
@@ -303,6 +281,12 @@ class QRCodeScannerApp(QMainWindow):
         """)
         self.center_layout.addWidget(self.video_label)
         
+        # Live hint while the quality gate is skipping frames of the preview camera
+        self.quality_label = QLabel("")
+        self.quality_label.setAlignment(Qt.AlignCenter)
+        self.apply_style(self.quality_label, "hint")
+        self.center_layout.addWidget(self.quality_label)
+        
         # Key shortcuts info
         shortcuts_frame = QFrame()
         shortcuts_frame.setFrameShape(QFrame.StyledPanel)
@@ -333,10 +317,12 @@ class QRCodeScannerApp(QMainWindow):
         self.match_info_layout.addWidget(self.match_key_label)
         
         self.match_status_label = QLabel("Scan QR code to begin")
+        self.match_status_label.setWordWrap(True)
         self.match_info_layout.addWidget(self.match_status_label)
         
         # Progress bar frame
-        self.progress_frame = QFrame()
+        self.progress_frame = ProgressFrame()
+        self.progress_frame.setProperty("progressColor", UI_COLORS["accent"])
         self.progress_frame.setMinimumHeight(25)
         self.progress_frame.setStyleSheet("background-color: #f0f0f0; border-radius: 5px;")
         self.match_info_layout.addWidget(self.progress_frame)
@@ -380,10 +366,37 @@ class QRCodeScannerApp(QMainWindow):
         self.camera_combo = QComboBox()
         for camera in self.available_cameras:
             self.camera_combo.addItem(camera["name"], camera["index"])
+        if self.camera_combo.findData(last_camera) >= 0:
+            self.camera_combo.setCurrentIndex(self.camera_combo.findData(last_camera))
         self.camera_combo.currentIndexChanged.connect(self.switch_camera)
         camera_select_layout.addWidget(self.camera_combo)
         self.camera_layout.addLayout(camera_select_layout)
 
+        # Scan with every camera at once, the selector then only picks the preview
+        self.multi_camera_checkbox = QCheckBox("Scan With All Cameras")
+        self.multi_camera_checkbox.toggled.connect(self.toggle_multi_camera)
+        self.camera_layout.addWidget(self.multi_camera_checkbox)
+
+        # Per-camera throughput
+        self.throughput_labels = {}
+        self.throughput_layout = QVBoxLayout()
+        self.camera_layout.addLayout(self.throughput_layout)
+        self.build_throughput_labels()
+
+        # Optional per-stage latency panel, refreshed with the throughput labels
+        self.stats_checkbox = QCheckBox("Show Latency Stats")
+        self.stats_checkbox.toggled.connect(self.toggle_stats_panel)
+        self.camera_layout.addWidget(self.stats_checkbox)
+        self.stats_label = QLabel()
+        self.stats_label.setStyleSheet("font-family: Consolas, monospace; font-size: 11px;")
+        self.stats_label.setVisible(False)
+        self.camera_layout.addWidget(self.stats_label)
+
+        # Probe for cameras again without blocking the window
+        self.rescan_button = QPushButton("Rescan Cameras")
+        self.rescan_button.clicked.connect(self.rescan_cameras)
+        self.camera_layout.addWidget(self.rescan_button)
+
         # Camera buttons
         button_layout = QHBoxLayout()
 
@@ -398,6 +411,45 @@ class QRCodeScannerApp(QMainWindow):
 
         self.camera_layout.addLayout(button_layout)
 
+        # Preview rate, independent of the capture and decode rate
+        preview_layout = QHBoxLayout()
+        preview_layout.addWidget(QLabel("Preview:"))
+        self.preview_fps_combo = QComboBox()
+        for fps in (30, 15, 10, 5):
+            self.preview_fps_combo.addItem(f"{fps} fps", fps)
+        self.preview_fps_combo.setCurrentIndex(self.preview_fps_combo.findData(preview_settings["fps"]))
+        self.preview_fps_combo.currentIndexChanged.connect(self.update_preview_fps)
+        preview_layout.addWidget(self.preview_fps_combo)
+        self.low_power_checkbox = QCheckBox("Low Power")
+        self.low_power_checkbox.setChecked(preview_settings["low_power"])
+        self.low_power_checkbox.toggled.connect(self.toggle_low_power_preview)
+        preview_layout.addWidget(self.low_power_checkbox)
+        self.camera_layout.addLayout(preview_layout)
+
+        # How much goes to the log file, can be turned up while chasing a problem
+        log_level_layout = QHBoxLayout()
+        log_level_layout.addWidget(QLabel("Log Level:"))
+        self.log_level_combo = QComboBox()
+        for level in ("DEBUG", "INFO", "WARNING", "ERROR"):
+            self.log_level_combo.addItem(level.capitalize(), level)
+        self.log_level_combo.setCurrentIndex(max(0, self.log_level_combo.findData(logging_settings["level"].upper())))
+        self.log_level_combo.currentIndexChanged.connect(
+            lambda: set_log_level(self.log_level_combo.currentData()))
+        log_level_layout.addWidget(self.log_level_combo)
+        self.camera_layout.addLayout(log_level_layout)
+
+        # Decoder backend, "Auto" benchmarks the available ones on the first frame
+        decoder_layout = QHBoxLayout()
+        decoder_layout.addWidget(QLabel("Decoder:"))
+        self.decoder_combo = QComboBox()
+        self.decoder_combo.addItem("Auto", "auto")
+        for backend in available_decoders():
+            self.decoder_combo.addItem(backend.capitalize() if backend != "opencv" else "OpenCV", backend)
+        self.decoder_combo.setCurrentIndex(max(0, self.decoder_combo.findData(qr_detection_settings["decoder_backend"])))
+        self.decoder_combo.currentIndexChanged.connect(self.change_decoder_backend)
+        decoder_layout.addWidget(self.decoder_combo)
+        self.camera_layout.addLayout(decoder_layout)
+
         # Fullscreen button
         self.fullscreen_button = QPushButton("Toggle Fullscreen")
         self.fullscreen_button.clicked.connect(self.toggle_fullscreen)
@@ -411,9 +463,14 @@ class QRCodeScannerApp(QMainWindow):
 
         # Add "Check CSV Data" button to the right panel
         self.check_csv_button = QPushButton("Check CSV Data")
-        self.check_csv_button.clicked.connect(self.check_csv_data)
+        self.check_csv_button.clicked.connect(self.session.check_csv_data)
         self.right_layout.addWidget(self.check_csv_button)
 
+        # Add "Export CSV" button, writes results.csv and the per-scan files from the scan store
+        self.export_csv_button = QPushButton("Export CSV")
+        self.export_csv_button.clicked.connect(lambda: self.session.export_csv(scan_files=True))
+        self.right_layout.addWidget(self.export_csv_button)
+
         # Add "Open Save Folder" button to the right panel
         self.open_folder_button = QPushButton("Open Save Folder")
         self.open_folder_button.clicked.connect(self.open_save_folder)
@@ -424,11 +481,26 @@ class QRCodeScannerApp(QMainWindow):
         # Add right panel to main layout
         self.main_layout.addWidget(self.right_panel, 1)
         
-        # Camera thread and timer setup
-        self.camera_thread = None
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_ui)
-        self.timer.start(100)  # Update UI every 100ms
+        # Decoding runs off the GUI thread, only results come back through the signal
+        self.decode_results.connect(self.handle_decode_result)
+        self.quality_hint.connect(self.show_quality_hint)
+        self.decoder_pool = DecodeWorkerPool(self.decode_results.emit, workers, on_quality=self.quality_hint.emit)
+        self.decoder_pool.start()
+        
+        # Camera threads keyed by camera index, the combo box picks the preview camera
+        self.camera_threads = {}
+        # Match and tablet widgets only change when a scan does, the session state is not polled
+        self.match_state_changed.connect(self.update_match_state)
+        self.throughput_timer = QTimer()
+        self.throughput_timer.timeout.connect(self.update_throughput)
+        self.throughput_timer.start(1000)
+        self.metrics_timer = QTimer()
+        self.metrics_timer.timeout.connect(lambda: pipeline_metrics.write(METRICS_FILE))
+        if metrics_settings["interval"] > 0:
+            self.metrics_timer.start(int(metrics_settings["interval"] * 1000))
+        self.preview_timer = QTimer()
+        self.preview_timer.timeout.connect(self.render_preview)
+        self.apply_preview_rate()
         
         # QR code data
         self.qr_data = None
@@ -437,9 +509,12 @@ class QRCodeScannerApp(QMainWindow):
         # Keyboard shortcuts
         self.installEventFilter(self)
         
-        # Start with the first camera
+        # Start with the previous camera straight away, then look for cameras in the background
+        self.cameras_discovered.connect(self.update_camera_list)
+        self.match_state_changed.emit()  # Show matches still outstanding from earlier runs
         if self.available_cameras:
             self.start_camera()
+        self.rescan_cameras()
     
     def eventFilter(self, obj, event):
         if event.type() == event.KeyPress:
@@ -461,75 +536,110 @@ class QRCodeScannerApp(QMainWindow):
     def to_stylesheet_color(self, qcolor):
         return f"rgb({qcolor.red()}, {qcolor.green()}, {qcolor.blue()})"
     
-    def scan_available_cameras(self):
-        """Scan system for available cameras"""
-        available_cameras = []
-        system = platform.system()
-        
-        # Different approach based on OS
-        if system == "Windows":
-            # Try the first 5 camera indices
-            for i in range(5):
-                cap = cv2.VideoCapture(i, cv2.CAP_DSHOW)
-                if cap.isOpened():
-                    ret, _ = cap.read()
-                    if ret:
-                        cap.release()
-                        camera_name = f"Camera {i+1}"
-                        available_cameras.append({"index": i, "name": camera_name})
-                    else:
-                        cap.release()
-        else:
-            # Linux/Mac approach
-            for i in range(5):
-                cap = cv2.VideoCapture(i)
-                if cap.isOpened():
-                    ret, _ = cap.read()
-                    if ret:
-                        cap.release()
-                        camera_name = f"Camera {i+1}"
-                        available_cameras.append({"index": i, "name": camera_name})
-                    else:
-                        cap.release()
+    def apply_style(self, widget, style):
+        """Set one of the cached self.styles on a widget unless it already has it"""
+        if self.applied_styles.get(widget) != style:
+            self.applied_styles[widget] = style
+            widget.setStyleSheet(self.styles[style])
+    
+    def rescan_cameras(self):
+        """Probe for cameras on a background thread, the result arrives via cameras_discovered"""
+        if self.rescan_thread is not None and self.rescan_thread.is_alive():
+            return
+        self.rescan_button.setEnabled(False)
+        # Only cameras that are delivering frames can skip the probe, a failed or finished thread proves nothing
+        running = {index for index, thread in self.camera_threads.items()
+                   if thread.isRunning() and thread.camera.running and thread.camera.ring is not None}
+        self.rescan_thread = threading.Thread(
+            target=lambda: self.cameras_discovered.emit(discover_cameras(known_good=running)),
+            name="camera-rescan", daemon=True)
+        self.rescan_thread.start()
+    
+    def update_camera_list(self, cameras):
+        """Replace the camera list with a fresh scan, keeping the current selection"""
+        self.rescan_button.setEnabled(True)
+        current = self.camera_combo.currentData()
+        self.available_cameras = cameras
+        
+        self.camera_combo.blockSignals(True)
+        self.camera_combo.clear()
+        for camera in cameras:
+            self.camera_combo.addItem(camera["name"], camera["index"])
+        self.camera_combo.setCurrentIndex(max(0, self.camera_combo.findData(current)))
+        self.camera_combo.blockSignals(False)
+        self.build_throughput_labels()
         
-        if not available_cameras:
-            print("No cameras found")
-            available_cameras.append({"index": 0, "name": "Default Camera"})
+        save_camera_cache(cameras, self.camera_combo.currentData())
+        self.add_status_message(f"Found {len(cameras)} camera(s)", "info")
         
-        print(f"Found {len(available_cameras)} cameras: {[cam['name'] for cam in available_cameras]}")
-        return available_cameras
+        # The cached camera is gone, move the running scanner to one that exists
+        if self.camera_threads and self.camera_combo.currentData() != current:
+            self.start_camera()
+    
+    def build_throughput_labels(self):
+        """Create one throughput label per available camera"""
+        for label in self.throughput_labels.values():
+            self.throughput_layout.removeWidget(label)
+            label.deleteLater()
+        self.throughput_labels = {}
+        for camera in self.available_cameras:
+            throughput_label = QLabel(f"{camera['name']}: stopped")
+            throughput_label.setStyleSheet(f"color: {self.to_stylesheet_color(UI_COLORS['text_secondary'])};")
+            self.throughput_layout.addWidget(throughput_label)
+            self.throughput_labels[camera["index"]] = throughput_label
     
     def start_camera(self):
-        """Start the camera thread"""
-        if self.camera_thread is not None and self.camera_thread.isRunning():
-            self.stop_camera()
+        """Start the selected camera, or every camera when scanning with all of them"""
+        self.stop_camera()
         
-        camera_index = self.camera_combo.currentData()
-        self.camera_thread = CameraThread(camera_index)
-        self.camera_thread.frame_ready.connect(self.process_frame)
-        self.camera_thread.start()
+        if self.multi_camera_checkbox.isChecked():
+            camera_indices = [camera["index"] for camera in self.available_cameras]
+        else:
+            camera_indices = [self.camera_combo.currentData()]
+        
+        self.last_frame_seq = 0
+        for camera_index in camera_indices:
+            camera_thread = CameraThread(camera_index, self.decoder_pool, self.scene_changed)
+            camera_thread.start()
+            self.camera_threads[camera_index] = camera_thread
         
         self.start_button.setEnabled(False)
         self.stop_button.setEnabled(True)
         self.save_button.setEnabled(True)
-        self.add_status_message(f"Started camera {camera_index}", "info")
+        cameras = ", ".join(str(index) for index in camera_indices)
+        self.add_status_message(f"Started camera {cameras}", "info")
+        save_camera_cache(self.available_cameras, self.camera_combo.currentData())
     
     def stop_camera(self):
-        """Stop the camera thread"""
-        if self.camera_thread is not None and self.camera_thread.isRunning():
-            self.camera_thread.stop()
-            self.camera_thread = None
-            self.video_label.setText("Camera feed stopped")
-            
-            self.start_button.setEnabled(True)
-            self.stop_button.setEnabled(False)
-            self.save_button.setEnabled(False)
-            self.add_status_message("Camera stopped", "info")
+        """Stop all camera threads"""
+        if not self.camera_threads:
+            return
+        for camera_thread in self.camera_threads.values():
+            camera_thread.stop()
+        self.camera_threads = {}
+        self.video_label.setText("Camera feed stopped")
+        
+        self.start_button.setEnabled(True)
+        self.stop_button.setEnabled(False)
+        self.save_button.setEnabled(False)
+        self.add_status_message("Camera stopped", "info")
     
     def switch_camera(self, _):
-        """Switch to the selected camera"""
-        if self.camera_thread is not None and self.camera_thread.isRunning():
-            self.stop_camera()
+        """Switch to the selected camera, or just the preview when all cameras are running"""
+        if not self.camera_threads:
+            return
+        camera_index = self.camera_combo.currentData()
+        if camera_index in self.camera_threads:
+            self.last_frame_seq = 0
+            self.show_quality_hint(camera_index, self.decoder_pool.quality_hints.get(camera_index))
+        else:
+            self.start_camera()
+    
+    def toggle_multi_camera(self, enabled):
+        """Toggle scanning with every available camera at once"""
+        mode = "enabled" if enabled else "disabled"
+        self.add_status_message(f"Multi-camera scanning {mode}", "info")
+        if self.camera_threads:
             self.start_camera()
     
     def next_camera(self):
@@ -565,56 +675,135 @@ class QRCodeScannerApp(QMainWindow):
         mode = "enabled" if enabled else "disabled"
         self.add_status_message(f"Region highlighting {mode}", "info")
     
+    def toggle_motion_gate(self, enabled):
+        """Toggle idling the decoder while nothing moves in front of the camera"""
+        qr_detection_settings["motion_gate_enabled"] = enabled
+        mode = "enabled" if enabled else "disabled"
+        self.add_status_message(f"Motion gating {mode}", "info")
+    
+    def toggle_quality_gate(self, enabled):
+        """Toggle skipping frames too blurred or glared to decode"""
+        qr_detection_settings["quality_gate_enabled"] = enabled
+        if not enabled:
+            self.quality_label.setText("")
+        mode = "enabled" if enabled else "disabled"
+        self.add_status_message(f"Quality gate {mode}", "info")
+    
+    def toggle_fallback(self, enabled):
+        """Toggle retrying missed regions with contrast stretching, CLAHE and upsampling"""
+        qr_detection_settings["fallback_enabled"] = enabled
+        mode = "enabled" if enabled else "disabled"
+        self.add_status_message(f"Preprocessing fallback {mode}", "info")
+    
+    def scene_changed(self, camera_index, active):
+        """Re-show the camera's quality hint when its scene turns active or idle, from the capture thread"""
+        self.quality_hint.emit(camera_index, self.decoder_pool.quality_hints.get(camera_index))
+
+    def show_quality_hint(self, camera_index, hint):
+        """Show the quality gate's hint for the preview camera, called through quality_hint"""
+        if camera_index != self.camera_combo.currentData():
+            return
+        camera_thread = self.camera_threads.get(camera_index)
+        # An empty static scene is blurry too, only hint while something is in front of the camera
+        if hint is None or camera_thread is None or not camera_thread.camera.motion_gate.active:
+            self.quality_label.setText("")
+        else:
+            self.quality_label.setText(QUALITY_HINTS[hint])
+    
+    def update_preview_fps(self, _):
+        """Change the preview refresh rate"""
+        preview_settings["fps"] = self.preview_fps_combo.currentData()
+        self.apply_preview_rate()
+    
+    def toggle_low_power_preview(self, enabled):
+        """Toggle the smaller, slower low-power preview"""
+        preview_settings["low_power"] = enabled
+        self.apply_preview_rate()
+        mode = "enabled" if enabled else "disabled"
+        self.add_status_message(f"Low-power preview {mode}", "info")
+    
+    def apply_preview_rate(self):
+        """Restart the preview timer at the configured rate"""
+        fps = preview_settings["fps"]
+        if preview_settings["low_power"]:
+            fps = min(fps, preview_settings["low_power_fps"])
+        self.preview_timer.start(int(1000 / fps))
+    
+    def change_decoder_backend(self, _):
+        """Switch the decoder pool to the selected backend"""
+        qr_detection_settings["decoder_backend"] = self.decoder_combo.currentData()
+        self.decoder_pool.set_backend(qr_detection_settings["decoder_backend"])
+        self.add_status_message(f"Decoder set to {self.decoder_combo.currentText()}", "info")
+    
     def update_brightness(self, value):
         """Update brightness threshold"""
         qr_detection_settings["brightness_threshold"] = value
         self.brightness_value.setText(str(value))
     
-    def update_ui(self):
-        """Update UI elements that need periodic updates"""
-        # Update tablet status
+    def update_match_state(self):
+        """Refresh the tablet and match widgets, called through match_state_changed"""
         self.update_tablet_status()
-        
-        # Update match info
         self.update_match_info()
     
     def update_tablet_status(self):
         """Update tablet status display"""
-        for tablet_key, status in scanned_tablets.items():
+        receiving = {tablet_id: (received, total, self.session.assembler.missing_parts(record_id))
+                     for record_id, (tablet_id, received, total) in self.session.part_progress.items() if tablet_id}
+        scanned = self.session.tracker.scanned(self.session.last_match_key)
+        for tablet_key in TABLET_IDS:
+            status = tablet_key in scanned
             if tablet_key in self.tablet_labels:
                 label = self.tablet_labels[tablet_key]
-                if status:
+                # QLabel.setText returns early when the text is unchanged
+                if tablet_key in receiving and not status:
+                    received, total, missing = receiving[tablet_key]
+                    label.setText(f"RECEIVING {received}/{total}, NEED {', '.join(map(str, missing[:4]))}"
+                                  + ("..." if len(missing) > 4 else ""))
+                    self.apply_style(label, "receiving")
+                elif status:
                     label.setText("✓ SCANNED")
-                    label.setStyleSheet(f"color: {self.to_stylesheet_color(UI_COLORS['success'])}; font-weight: bold;")
+                    self.apply_style(label, "scanned")
                 else:
                     label.setText("WAITING...")
-                    label.setStyleSheet("color: gray;")
+                    self.apply_style(label, "waiting")
     
     def update_match_info(self):
         """Update match information display"""
-        if self.last_match_key:
-            self.match_key_label.setText(self.last_match_key)
+        # Other matches still missing tablets, so they can be cleared in any order
+        outstanding = {key: tablets for key, tablets in self.session.tracker.outstanding().items()
+                       if key != self.session.last_match_key}
+        outstanding_text = None
+        if outstanding:
+            shown = [f"{key.rsplit('_', 1)[-1]} ({len(tablets)})" for key, tablets in list(outstanding.items())[:6]]
+            more = f" +{len(outstanding) - 6} more" if len(outstanding) > 6 else ""
+            outstanding_text = f"Outstanding: {', '.join(shown)}{more}"
+
+        if self.session.last_match_key:
+            self.match_key_label.setText(self.session.last_match_key)
+            self.match_status_label.setText(outstanding_text or "No other matches outstanding")
             
             # Calculate completeness
-            scanned_count = sum(1 for status in scanned_tablets.values() if status)
-            total_tablets = len(scanned_tablets)
+            scanned_count = len(self.session.tracker.scanned(self.session.last_match_key))
+            total_tablets = len(TABLET_IDS)
             percent_complete = int((scanned_count / total_tablets) * 100)
             
             self.progress_label.setText(f"{percent_complete}% Complete")
             self.tablets_count_label.setText(f"{scanned_count}/{total_tablets} Tablets Scanned")
             
-            # Update progress bar (drawn in paintEvent of progress_frame)
-            self.progress_frame.setProperty("progress", percent_complete/100)
-            self.progress_frame.setStyleSheet(
-                f"background-color: #f0f0f0; border-radius: 5px; "
-                f"background-color: {self.to_stylesheet_color(UI_COLORS['accent'])};"
-            )
-            self.progress_frame.update()
+            # Update progress bar (drawn in paintEvent of progress_frame), repaint only
+            self.set_progress(percent_complete / 100)
         else:
             self.match_key_label.setText("No Active Match")
-            self.match_status_label.setText("Scan QR code to begin")
+            self.match_status_label.setText(outstanding_text or "Scan QR code to begin")
             self.progress_label.setText("0% Complete")
             self.tablets_count_label.setText("0/6 Tablets Scanned")
+            self.set_progress(0.0)
+    
+    def set_progress(self, progress):
+        """Repaint the progress bar if its value changed"""
+        if self.progress_frame.property("progress") != progress:
+            self.progress_frame.setProperty("progress", progress)
+            self.progress_frame.update()
     
     def add_status_message(self, message, message_type="info"):
         """Add a message to the status message queue"""
@@ -631,6 +820,7 @@ class QRCodeScannerApp(QMainWindow):
         self.recent_messages.append({
             "text": f"[{timestamp}] {message}",
             "color": color,
+            "style": message_type if message_type in ("success", "warning", "error") else "info",
             "time_added": time.time()
         })
         
@@ -641,321 +831,180 @@ class QRCodeScannerApp(QMainWindow):
         # Update the log labels
         for i, (label, msg) in enumerate(zip(self.log_labels, reversed(self.recent_messages))):
             label.setText(msg["text"])
-            label.setStyleSheet(f"color: {self.to_stylesheet_color(msg['color'])};")
+            self.apply_style(label, msg["style"])
         
         # Fill remaining labels with empty text
         for i in range(len(self.recent_messages), len(self.log_labels)):
             self.log_labels[i].setText("")
     
-    def find_potential_qr_regions(self, frame):
-        """Find bright rectangular regions that might contain QR codes."""
-        # Remove all filtering logic to keep the camera feed unfiltered
-        return []
-
-    def process_frame(self, frame_bytes):
-        """Process a frame from the camera."""
+    def render_preview(self):
+        """Draw the newest frame of the preview camera, called by the preview timer."""
+        start = time.perf_counter()
+        camera_index = self.camera_combo.currentData()
+        camera_thread = self.camera_threads.get(camera_index)
+        if camera_thread is None or camera_thread.camera.ring is None:
+            return
+        ring = camera_thread.camera.ring
+        latest = ring.acquire_latest()
+        if latest is None:
+            return
+        index, frame_seq, frame = latest
         try:
-            # Convert bytes to PIL Image
-            pil_image = Image.open(io.BytesIO(frame_bytes)).convert("RGB")
-
-            # Decode QR codes using pyzbar directly on the PIL image
-            detected_codes = decode(pil_image)
-
-            # Prepare the image for display (convert to QImage)
-            q_img = QImage(pil_image.tobytes(), pil_image.width, pil_image.height, QImage.Format_RGB888)
-
-            # Process detected QR codes
-            for code in detected_codes:
-                qr_data = code.data.decode('utf-8')
-
-                # Check for duplicates
-                if qr_data in self.scanned_data_history:
-                    # Play duplicate sound
-                    if hasattr(self, 'duplicate_sound') and self.duplicate_sound is not None:
-                        self.duplicate_sound.play()
-                    self.add_status_message(f"QR code already scanned: {qr_data[:30]}...", "warning")
-                    continue
-
-                # Add to scanned history
-                self.scanned_data_history.add(qr_data)
-
-                # Identify the tablet and update status
-                tablet_id = self.identify_tablet(qr_data)
-                if tablet_id and tablet_id in scanned_tablets:
-                    scanned_tablets[tablet_id] = True
-                    self.update_tablet_status()
+            # Nothing new since the last tick
+            if frame_seq == self.last_frame_seq:
+                return
+            self.last_frame_seq = frame_seq
+
+            # Downscale straight out of the ring slot into a reused buffer
+            scale = preview_settings["low_power_scale"] if preview_settings["low_power"] else preview_settings["scale"]
+            if scale != 1.0:
+                height, width = int(frame.shape[0] * scale), int(frame.shape[1] * scale)
+                if self.preview_buffer is None or self.preview_buffer.shape[:2] != (height, width):
+                    self.preview_buffer = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+                else:
+                    cv2.resize(frame, (width, height), dst=self.preview_buffer, interpolation=cv2.INTER_AREA)
+                image = self.preview_buffer
+            else:
+                image = frame
+
+            # QPixmap.fromImage makes the only copy
+            height, width = image.shape[:2]
+            q_img = QImage(image.data, width, height, image.strides[0], QImage.Format_BGR888)
+            pixmap = QPixmap.fromImage(q_img)
+            if qr_detection_settings["highlight_potential"]:
+                self.highlight_regions(pixmap, self.decoder_pool.regions.get(camera_index, []), scale)
+            self.video_label.setPixmap(pixmap)
+            self.display_rate.tick()
+            pipeline_metrics.record("preview", time.perf_counter() - start)
 
-                # Save the QR data
-                self.save_qr_data(qr_data, tablet_id)
+        except Exception as e:
+            log.warning("Error rendering preview: %s", e, exc_info=log.isEnabledFor(logging.DEBUG))
+        finally:
+            ring.release(index)
 
-                # Add status message
-                self.add_status_message(f"Scanned data from {tablet_id or 'Unknown'}", "success")
+    def highlight_regions(self, pixmap, regions, scale=1.0):
+        """Outline candidate QR regions on the preview pixmap"""
+        if not regions:
+            return
+        painter = QPainter(pixmap)
+        painter.setPen(QPen(UI_COLORS["accent_secondary"], 2))
+        for x, y, w, h in regions:
+            painter.drawRect(QRect(int(x * scale), int(y * scale), int(w * scale), int(h * scale)))
+        painter.end()
+
+    def handle_decode_result(self, result):
+        """Handle QR codes found by the decoder pool, from any camera."""
+        start = time.perf_counter()
+        pipeline_metrics.record("result_handoff", start - result["decoded_at"])
+        ui_time = 0.0
+        for event in self.session.scan_events(result["codes"]):
+            event_start = time.perf_counter()
+            if event.kind == "partial":
+                self.add_status_message(event.message, "info")
+                self.match_state_changed.emit()
+            elif event.kind == "duplicate":
+                # Play duplicate sound
+                if hasattr(self, 'duplicate_sound') and self.duplicate_sound is not None:
+                    self.duplicate_sound.play()
+                self.add_status_message(event.message, "warning")
+            elif event.kind == "saved":
+                camera = result["camera"]
+                self.camera_scan_counts[camera] = self.camera_scan_counts.get(camera, 0) + len(event.saved)
+                self.match_state_changed.emit()
+                self.add_status_message(event.message, "success")
 
                 # Play success sound
                 if hasattr(self, 'success_sound') and self.success_sound is not None:
                     self.success_sound.play()
 
-                print(f"Scanned QR Code: {qr_data[:30]}...")
-
-            # Update the video label with the unfiltered image
-            self.video_label.setPixmap(QPixmap.fromImage(q_img))
+                log.info("Scanned QR code on camera %s: %s", camera, event.message)
+            ui_time += time.perf_counter() - event_start
 
-        except Exception as e:
-            print(f"Error processing frame: {e}")
-            import traceback
-            traceback.print_exc()
-
-    def identify_tablet(self, csv_data):
-        """Identify which tablet the data came from based on CSV values"""
-        try:
-            print("Heelo")
-            parts = csv_data.split(',')
-            if len(parts) < 6:
-                return None
-                
-            alliance_color = parts[3]  # allianceColor (Red/Blue)
-            station = parts[5]        # station (1,2,3)
+        # The session records its own time as "parse"
+        pipeline_metrics.record("ui", ui_time)
 
-            
-            if alliance_color and station:
-                return f"{alliance_color} {station}"
-            return None
-        except Exception as e:
-            print(f"Error identifying tablet: {e}")
-            return None
-    
-    def get_match_key(self, csv_data):
-        """Extract match key from CSV data"""
-        try:
-            parts = csv_data.split(',')
-            if len(parts) < 4:
-                return None
-            return parts[2]  # matchKey
-        except:
-            return None
-    
-    def sanitize_csv_data(self, data):
-        """Sanitize CSV data to handle commas in string fields."""
-        print("Sanitizing CSV data...")
-        print(data)
-        sanitized_data = []
-        for field, value in zip(CSV_HEADER.split(','), data.split(',')):
-            if field == "endgame_Comments":
-                # Replace commas in the endgame_Comments field with a pipe (|) or another character
-                value = value.replace(',', '|')
-                print(value)
-            sanitized_data.append(value)
-            print(sanitized_data)
-        return ','.join(sanitized_data)
-
-    def save_qr_data(self, data, tablet_id=None):
-        """Save the QR code data to a file and update tracking."""
-        global scanned_tablets
-
-        # Sanitize the data to handle commas in string fields
-        data = self.sanitize_csv_data(data)
+    def report_frame_rates(self):
+        """Log per-stage frames-per-second figures every few seconds"""
+        current_time = time.time()
+        if current_time - self.last_rate_report < 10:
+            return
+        self.last_rate_report = current_time
+        for camera_index, camera_thread in self.camera_threads.items():
+            decode_rate = self.decoder_pool.camera_decode_rates.get(camera_index)
+            decode_fps = decode_rate.rate() if decode_rate else 0.0
+            scene = "active" if camera_thread.camera.motion_gate.active else "idle"
+            log.debug("Camera %s fps: capture %.1f | decode %.1f | scene %s",
+                      camera_index, camera_thread.camera.capture_rate.rate(), decode_fps, scene)
+        log.debug("Pipeline fps: decode %.1f | preview %.1f | dropped %d",
+                  self.decoder_pool.decode_rate.rate(), self.display_rate.rate(), self.decoder_pool.dropped_frames)
+
+    def update_throughput(self):
+        """Refresh the per-camera throughput labels"""
+        self.report_frame_rates()
+        for camera_index, label in self.throughput_labels.items():
+            camera_thread = self.camera_threads.get(camera_index)
+            name = self.camera_combo.itemText(self.camera_combo.findData(camera_index))
+            if camera_thread is None:
+                label.setText(f"{name}: stopped")
+                continue
+            decode_rate = self.decoder_pool.camera_decode_rates.get(camera_index)
+            decode_fps = decode_rate.rate() if decode_rate else 0.0
+            scans = self.camera_scan_counts.get(camera_index, 0)
+            label.setText(f"{name}: {camera_thread.camera.capture_rate.rate():.0f} fps, "
+                          f"{decode_fps:.0f} decodes/s, {scans} scans")
+        if self.stats_label.isVisible():
+            self.update_stats_panel()
+
+    def toggle_stats_panel(self, checked):
+        """Show or hide the per-stage latency panel"""
+        self.stats_label.setVisible(checked)
+        if checked:
+            self.update_stats_panel()
+
+    def update_stats_panel(self):
+        """Show p50/p90/p99 latency of every pipeline stage"""
+        lines = [f"{'stage':<15}{'p50':>8}{'p90':>8}{'p99':>8}{'n':>7}"]
+        quality = self.decoder_pool.quality.get(self.camera_combo.currentData())
+        for stage, stats in pipeline_metrics.snapshot().items():
+            lines.append(f"{stage:<15}{stats['p50']:>8.1f}{stats['p90']:>8.1f}{stats['p99']:>8.1f}{stats['count']:>7}")
+        if quality:
+            lines.append(f"sharpness {quality[0]:.0f}, glare {quality[1]:.0%}, "
+                         f"{self.decoder_pool.low_quality_frames} frames skipped")
+        lines.append("decoded by " + ", ".join(f"{tier} {hits}" for tier, hits in self.decoder_pool.tier_hits.items()))
+        lines.append(f"store backlog {self.session.store.backlog()}, "
+                     f"{self.session.store.backpressure_events} over the queue limit")
+        backend = self.decoder_pool.active_backend or "choosing..."
+        self.stats_label.setText("\n".join(lines) + f"\n(ms, last 1-2 min, decoder {backend})")
 
-        # Remove quotes if present
-        data = data.strip('"\'')
-        
-        # Extract match key to track matches
-        match_key = self.get_match_key(data)
-        
-        # If we've moved to a new match, reset tablet tracking
-        if match_key and match_key != self.last_match_key:
-            self.last_match_key = match_key
-            for key in scanned_tablets:
-                scanned_tablets[key] = False
-        
-        # Mark this tablet as scanned
-        if tablet_id:
-            scanned_tablets[tablet_id] = True
-        
-        # Create unique filename with timestamp and tablet ID
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        tablet_suffix = f"_{tablet_id.replace(' ', '')}" if tablet_id else ""
-        match_suffix = f"_{match_key}" if match_key else ""
-        
-        filename = f"qr_data{match_suffix}{tablet_suffix}_{timestamp}.csv"
-        filepath = os.path.join(SAVE_DIR, filename)
-        
-        # Save data to individual file
-        try:
-            with open(filepath, 'w') as f:
-                f.write(data)
-            print(f"Data saved to {filepath}")
-        except Exception as e:
-            error_msg = f"Error saving file: {str(e)}"
-            print(error_msg)
-            self.add_status_message(error_msg, "error")
-            return None
-        
-        # Also append to combined results CSV
-        self.append_to_results_csv(data)
-        
-        return filepath
-    
     def manual_save_qr_data(self):
         """Manually save the last QR code data"""
         if not self.qr_data:
             self.add_status_message("No QR code data to save", "warning")
             return
         
-        tablet_id = self.identify_tablet(self.qr_data)
-        filepath = self.save_qr_data(self.qr_data, tablet_id)
-        self.add_status_message(f"Manually saved QR data to {os.path.basename(filepath)}", "success")
+        record = parse_record(self.qr_data)
+        tablet_id = self.session.identify_tablet(record)
+        self.session.save_qr_data(record, tablet_id)
+        self.match_state_changed.emit()
+        self.add_status_message(f"Manually saved QR data from {tablet_id or 'Unknown'}", "success")
     
-    def append_to_results_csv(self, data):
-        """Append data to the combined results CSV file."""
-        try:
-            # Sanitize the data to handle commas in string fields
-            data = self.sanitize_csv_data(data)
-
-            # Check if file exists to determine if we need to write headers
-            file_exists = os.path.isfile(RESULTS_CSV)
-
-            # Convert the data string to a list of values
-            data_values = data.split(',')
-
-            # Open the file in append mode
-            with open(RESULTS_CSV, 'a', newline='') as csvfile:
-                writer = csv.writer(csvfile)
-
-                # Write header if file is new
-                if not file_exists:
-                    header = CSV_HEADER.split(',')
-                    writer.writerow(header)
-
-                # Write the data row
-                writer.writerow(data_values)
-
-            print(f"Data appended to {RESULTS_CSV}")
-        except Exception as e:
-            error_msg = f"Error appending to results CSV: {str(e)}"
-            print(error_msg)
-            self.add_status_message(error_msg, "error")
-    
-    def create_match_summary_file(self):
-        """Create a summary file for all tablets in a match"""
-        if not self.last_match_key:
-            return
-        
-        # Check if we have at least some data
-        if not any(scanned_tablets.values()):
-            return
-        
-        # Create a summary of which tablets were scanned
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"match_summary_{self.last_match_key}_{timestamp}.txt"
-        filepath = os.path.join(SAVE_DIR, filename)
-        
-        with open(filepath, 'w') as f:
-            f.write(f"Match Summary for {self.last_match_key}\n")
-            f.write("=" * 40 + "\n")
-            
-            for tablet, scanned in scanned_tablets.items():
-                status = "✓ SCANNED" if scanned else "✗ MISSING"
-                f.write(f"{tablet}: {status}\n")
-        
-        print(f"Match summary saved to {filepath}")
-        self.add_status_message(f"Match summary saved", "success")
-    
-    def validate_qr_data(self, data):
-        """Validate the QR code data format"""
-        try:
-            # Split the data into parts
-            parts = data.split(',')
-            # Ensure the data has the correct number of fields
-            if len(parts) != len(CSV_HEADER.split(',')):
-                return False
-            # Perform additional validation checks if necessary
-            # Example: Check if teamNumber is numeric
-            if not parts[0].isdigit():
-                return False
-            return True
-        except Exception as e:
-            print(f"Error validating QR data: {e}")
-            return False
-    
-    def check_csv_data(self):
-        """Check if the CSV file has all required headers and fix missing values."""
-        try:
-            if not os.path.exists(RESULTS_CSV):
-                self.add_status_message("CSV file does not exist.", "error")
-                return
-
-            # Read the CSV file
-            with open(RESULTS_CSV, 'r', newline='') as csvfile:
-                reader = csv.DictReader(csvfile)
-                rows = list(reader)
-
-                # Check for missing headers
-                missing_headers = [header for header in CSV_HEADER.split(',') if header not in reader.fieldnames]
-                if missing_headers:
-                    self.add_status_message(f"Missing headers: {', '.join(missing_headers)}. Fixing...", "warning")
-
-                # Fix rows with missing headers
-                fixed_rows = []
-                for row in rows:
-                    fixed_row = {header: row.get(header, "null") for header in CSV_HEADER.split(',')}
-                    fixed_rows.append(fixed_row)
-
-            # Write the fixed rows back to the CSV file
-            with open(RESULTS_CSV, 'w', newline='') as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=CSV_HEADER.split(','))
-                writer.writeheader()
-                writer.writerows(fixed_rows)
-
-            self.add_status_message("CSV data checked and fixed successfully.", "success")
-        except Exception as e:
-            self.add_status_message(f"Error checking CSV data: {e}", "error")
-            print(f"Error checking CSV data: {e}")
-
     def check_memory_usage(self):
-        """Monitor and manage memory usage"""
-        current_memory = psutil.Process(os.getpid()).memory_info().rss / 1024 / 1024  # MB
-        memory_percent = psutil.virtual_memory().percent
-        current_time = time.time()
-        
-        # Log memory usage periodically
-        print(f"Memory usage: {current_memory:.1f} MB ({memory_percent}%)")
-        
-        # Perform cleanup if memory usage is high
-        if memory_percent > 70 or current_time - self.last_gc_time > 600:  # 10 minutes
-            self.cleanup_memory()
-            self.last_gc_time = time.time()
-    
-    def cleanup_memory(self):
-        """Perform memory cleanup tasks"""
-        # Clear pixmap cache if it exists
-        if hasattr(self, 'video_label') and isinstance(self.video_label, QLabel):
-            self.video_label.setPixmap(QPixmap())
-        
-        # Limit size of scanned data history
-        if len(self.scanned_data_history) > self.max_history_size:
-            # Keep only the most recent entries
-            self.scanned_data_history = set(list(self.scanned_data_history)[-self.max_history_size:])
-        
-        # Clear any cached data in widgets
-        for widget in self.findChildren(QWidget):
-            widget.setUpdatesEnabled(False)
-            widget.setUpdatesEnabled(True)
-        
-        # Force garbage collection
-        gc.collect()
-        
-        self.add_status_message("Memory cleanup performed", "info")
+        """Check memory against the budget, called by the memory monitor timer"""
+        was_over_budget = self.memory_budget.over_budget
+        self.memory_budget.check()
+        if self.memory_budget.over_budget and not was_over_budget:
+            self.add_status_message(f"Memory use is over the {memory_settings['budget_mb']} MB budget, "
+                                    "released scan caches", "warning")
     
     def closeEvent(self, event):
         """Handle application close event"""
         self.stop_camera()
-        self.create_match_summary_file()
-        
-        # Clear any large objects
-        self.scanned_data_history.clear()
-        
-        # Final garbage collection
-        gc.collect()
+        self.decoder_pool.stop()
+        self.session.create_match_summary_file()
+        self.session.close()
+        if metrics_settings["interval"] > 0:
+            pipeline_metrics.write(METRICS_FILE)
+        stop_logging()
         event.accept()
 
     def setup_sounds(self):
@@ -982,9 +1031,9 @@ class QRCodeScannerApp(QMainWindow):
             self.duplicate_sound.setLoopCount(1)
             self.duplicate_sound.setVolume(0.5)
 
-            print("Sound files loaded successfully")
+            log.info("Sound files loaded successfully")
         except Exception as e:
-            print(f"Error setting up sounds: {e}")
+            log.warning("Error setting up sounds: %s", e)
             self.success_sound = None
             self.duplicate_sound = None
 
@@ -1022,11 +1071,17 @@ class ProgressFrame(QFrame):
             progress_color = QColor(0, 120, 212)  # Default blue
         
         # Draw progress
-        width = self.width() * progress
+        width = int(self.width() * progress)
         painter.fillRect(0, 0, width, self.height(), progress_color)
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    window = QRCodeScannerApp()
+    parser = argparse.ArgumentParser(description="Scout Ops QR scanner")
+    add_pipeline_arguments(parser)
+    # Anything else is left for Qt
+    args, qt_args = parser.parse_known_args()
+    settings_from_args(args)
+    setup_logging()
+    app = QApplication(sys.argv[:1] + qt_args)
+    window = QRCodeScannerApp(args.workers)
     window.show()
     sys.exit(app.exec_())
@@ -0,0 +1,2388 @@
+"""Qt-free scanner core: capture, decode, parse and persist.
+
+Shared by the Qt scanner window (qrcode_scanner.py), the headless service
+(scanner_service.py) and the offline replay harness (scanner_replay.py).
+"""
+import sys
+import os
+import atexit
+import bisect
+import ctypes
+import datetime
+import time
+import csv
+import hashlib
+import json
+import logging
+import logging.handlers
+import queue
+import re
+import sqlite3
+import threading
+import tracemalloc
+import zlib
+import platform
+import warnings  # To suppress warnings
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+try:
+    from pyzbar.pyzbar import ZBarSymbol, decode
+except ImportError:  # pyzbar or the zbar library is missing, the OpenCV decoders still work
+    ZBarSymbol = decode = None
+
+try:
+    import psutil
+except ImportError:  # Memory checks fall back to /proc, or are skipped
+    psutil = None
+
+# Suppress zbar warnings
+warnings.filterwarnings("ignore", category=RuntimeWarning)
+
+# Replace the get_application_path function with these functions
+def get_application_path():
+    """Get the base application path regardless of how the app is launched"""
+    if getattr(sys, 'frozen', False):
+        # Running as compiled executable
+        return os.path.dirname(sys.executable)
+    else:
+        # Running as script
+        return os.path.dirname(os.path.abspath(__file__))
+
+def get_data_directory():
+    """Get a writable directory for data storage"""
+    if platform.system() == "Windows":
+        # Use AppData folder on Windows
+        base_dir = os.path.join(os.path.expanduser("~"), "AppData", "Local", "ScoutOps")
+    else:
+        # Use home directory for other platforms
+        base_dir = os.path.join(os.path.expanduser("~"), ".scoutops")
+    
+    # Create the directory if it doesn't exist
+    os.makedirs(base_dir, exist_ok=True)
+    return base_dir
+
+# Update your directory paths to use the data directory
+SAVE_DIR = os.path.join(get_data_directory(), "scanned_data")
+os.makedirs(SAVE_DIR, exist_ok=True)
+
+# Update results path too
+RESULTS_CSV = os.path.join(get_data_directory(), "results.csv")
+
+# SQLite scan store, results.csv and the per-scan files are exported from it
+SCAN_DB = os.path.join(get_data_directory(), "scans.db")
+
+# Scan journal from before the store, imported into a new store
+JOURNAL_PATH = os.path.join(get_data_directory(), "scans.jsonl")
+
+# Rolling per-stage latency snapshots, one JSON line per metrics interval
+METRICS_FILE = os.path.join(get_data_directory(), "metrics.jsonl")
+
+# Rotating scanner log, see setup_logging
+LOG_FILE = os.path.join(get_data_directory(), "scanner.log")
+
+# Last known-good camera list, so the scanner window can open without probing
+CAMERA_CACHE = os.path.join(get_data_directory(), "cameras.json")
+
+# CSV header for reference
+CSV_HEADER = "teamNumber,scouterName,matchKey,allianceColor,eventKey,station,matchNumber,auton_CoralScoringLevel1,auton_CoralScoringLevel2,auton_CoralScoringLevel3,auton_CoralScoringLevel4,auton_LeftBarge,auton_AlgaeScoringProcessor,auton_AlgaeScoringBarge,botLocation,teleop_CoralScoringLevel1,teleop_CoralScoringLevel2,teleop_CoralScoringLevel3,teleop_CoralScoringLevel4,teleop_AlgaeScoringBarge,teleop_AlgaeScoringProcessor,teleop_AlgaePickUp,teleop_Defense,endgame_Deep_Climb,endgame_Shallow_Climb,endgame_Park,endgame_Comments"
+SCAN_FIELDS = CSV_HEADER.split(',')
+
+# A scanned row, parsed once and shared by the tablet, match, validation and storage helpers
+ScanRecord = namedtuple("ScanRecord", SCAN_FIELDS)
+
+def parse_record(csv_data):
+    """Split a CSV_HEADER row into a ScanRecord.
+
+    The split stops before the last field, so commas inside endgame_Comments
+    stay in the comment. Missing trailing fields are None.
+    """
+    values = csv_data.split(',', len(SCAN_FIELDS) - 1)
+    if len(values) < len(SCAN_FIELDS):
+        values += [None] * (len(SCAN_FIELDS) - len(values))
+    return ScanRecord._make(values)
+
+def format_record(record):
+    """Join a ScanRecord back into a CSV_HEADER row"""
+    return ','.join(value for value in record if value is not None)
+
+# The scouting tablets of a match, as returned by identify_tablet
+TABLET_IDS = ("Red 1", "Red 2", "Red 3", "Blue 1", "Blue 2", "Blue 3")
+
+# Decoder threads, leave a core free for capture and the GUI
+DECODE_WORKERS = max(1, min(2, (os.cpu_count() or 2) - 1))
+
+# QR detection settings
+qr_detection_settings = {
+    "brightness_threshold": 160,  # Screen brightness (0-255) for region detection and the fallback contrast stretch
+    "edge_threshold": 40,         # Dark-to-light step (0-255) that counts as the edge of a QR module
+    "min_rect_size": 50,          # Minimum code size in pixels
+    "max_rect_size": 500,         # Maximum code size in pixels
+    "rect_aspect_ratio": 1.5,     # Maximum aspect ratio of a code, allows for some tilt
+    "focus_enabled": True,        # Enable/disable smart focusing
+    "highlight_potential": True,  # Highlight potential QR code areas
+    "full_frame_interval": 5,     # Decode the whole frame every Nth frame while focusing
+    "motion_gate_enabled": True,  # Slow decoding down while the scene is static
+    "motion_threshold": 4.0,      # Mean frame-to-frame difference that counts as motion (0-255)
+    "presence_threshold": 12.0,   # Mean difference from the learned background that counts as a tablet
+    "active_hold_seconds": 3.0,   # Keep decoding at full rate this long after the last activity
+    "idle_decode_interval": 0.5,  # Seconds between decodes while idle
+    "decoder_backend": "auto",    # "zbar", "opencv", "wechat", or "auto" to benchmark them at startup
+    "quality_gate_enabled": True, # Skip decoding frames that are too blurred or glared to read
+    "blur_threshold": 30.0,       # Laplacian variance of the quarter-size frame below which it is blurred
+    "glare_threshold": 0.25,      # Fraction of a candidate code covered by a saturated blob above which it is glared
+    "quality_retry_interval": 0.5,  # Decode a low-quality frame anyway after this many seconds
+    "fallback_enabled": True,     # Retry candidate regions with stronger preprocessing when nothing decodes
+    "fallback_budget_ms": 30.0,   # Time per frame the fallback tiers may spend, tiers that won't fit are skipped
+    "fallback_regions": 2,        # Largest candidate regions the fallback tiers retry
+    "fallback_scales": (1.5, 2.0),  # Upsampling factors tried by the last tier
+    "clahe_clip_limit": 2.0,      # Contrast limit of the CLAHE tier
+    "adaptive_block_size": 31,    # Odd neighbourhood size in pixels of the adaptive threshold tier
+}
+
+# Preprocessing tiers, cheapest first. "raw" is the normal decode, the others only run when it finds nothing.
+FALLBACK_TIERS = ("raw", "stretch", "clahe", "adaptive", "upsample")
+
+# Hints shown for frames the quality gate skips
+QUALITY_HINTS = {
+    "blur": "Hold the tablet still",
+    "glare": "Tilt the tablet to cut the glare",
+}
+
+# Logging settings
+logging_settings = {
+    "level": os.environ.get("SCOUTOPS_LOG_LEVEL", "INFO"),  # Level written to LOG_FILE, see set_log_level
+    "console_level": "WARNING",   # Only problems reach the console
+    "max_bytes": 1024 * 1024,     # Rotate the log file at this size
+    "backup_count": 3,            # Rotated log files to keep
+    "rate_limit_seconds": 10.0,   # Repeated warnings and errors are logged once per window
+}
+
+log = logging.getLogger("scoutops")
+
+class RateLimitFilter(logging.Filter):
+    """Let a warning or error through once per interval for each message template.
+
+    Repeats inside the interval are counted and the count is added to the
+    next one that gets through, so a failing camera logs once every interval
+    instead of on every frame. Messages must use %-style arguments so their
+    template stays the same.
+    """
+
+    def __init__(self, interval=10.0):
+        super().__init__()
+        self.interval = interval
+        self._seen = {}  # (logger, level, template) -> [time last let through, repeats suppressed since]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if self.interval <= 0 or record.levelno < logging.WARNING:
+            return True
+        key = (record.name, record.levelno, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            seen = self._seen.get(key)
+            if seen is not None and now - seen[0] < self.interval:
+                seen[1] += 1
+                return False
+            suppressed = seen[1] if seen else 0
+            self._seen[key] = [now, 0]
+        if suppressed:
+            record.msg = f"{record.msg} (repeated {suppressed} times)"
+        return True
+
+_log_listener = None
+_log_file_handler = None
+
+def setup_logging(level=None, log_file=LOG_FILE, settings=logging_settings):
+    """Send the scoutops logger through a queue to a rotating file and a quiet console.
+
+    Logging from the capture, decoder and GUI threads only formats the record
+    and puts it on a queue; a listener thread does the writing.
+    """
+    global _log_listener, _log_file_handler
+    if _log_listener is not None:
+        return
+    handlers = []
+    try:
+        _log_file_handler = logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=settings["max_bytes"], backupCount=settings["backup_count"], encoding='utf-8')
+        _log_file_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(threadName)s] %(message)s"))
+        handlers.append(_log_file_handler)
+    except OSError as e:
+        print(f"Error opening log file {log_file}: {e}")
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(settings["console_level"])
+    console_handler.setFormatter(logging.Formatter("%(levelname)s: %(message)s"))
+    handlers.append(console_handler)
+
+    queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+    queue_handler.addFilter(RateLimitFilter(settings["rate_limit_seconds"]))
+    log.addHandler(queue_handler)
+    log.propagate = False
+    _log_listener = logging.handlers.QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    _log_listener.start()
+    set_log_level(level or settings["level"])
+    atexit.register(stop_logging)
+
+def set_log_level(level):
+    """Change how much goes to the log file while running, "DEBUG" traces every frame error and scan"""
+    level = level.upper() if isinstance(level, str) else level
+    log.setLevel(level)
+    if _log_file_handler is not None:
+        _log_file_handler.setLevel(level)
+
+def stop_logging():
+    """Write out queued log records and stop the listener thread"""
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+
+# Latency metrics settings
+metrics_settings = {
+    "window": 60.0,               # Seconds per histogram window, snapshots cover the last one to two windows
+    "interval": 60.0,             # Seconds between snapshots written to METRICS_FILE, 0 to disable
+}
+
+# Scan store settings
+store_settings = {
+    "fsync_policy": "group",      # "group": fsync every group commit, "interval": at most every fsync_interval, "none": leave it to the OS
+    "fsync_interval": 1.0,        # Seconds between WAL checkpoints with the "interval" policy
+    "group_window": 0.05,         # Seconds the writer waits for more scans to share one write
+    "queue_limit": 500,           # Scans kept in memory for the writer, older ones are spilled to disk
+    "dedupe_capacity": 5000,      # Scan digests kept in memory for duplicate checks
+    "dedupe_max_age": 0,          # Forget in-memory digests not seen for this many seconds, 0 for no limit
+    "csv_export_interval": 5.0,   # Rewrite results.csv at most this often while scans come in, 0 to only export on demand
+}
+
+# Memory budget settings
+memory_settings = {
+    "budget_mb": 512,             # Resident memory above which in-memory caches are released
+    "check_interval": 30.0,       # Seconds between budget checks
+    "tracemalloc": os.environ.get("SCOUTOPS_TRACEMALLOC", "") not in ("", "0"),  # Log what grew at every check
+    "tracemalloc_frames": 10,     # Stack depth recorded per allocation while tracing
+    "tracemalloc_top": 10,        # Allocation sites logged per check
+}
+
+# Module edges are found with a 3x3 gradient, closed into one blob per code, then opened to drop thin text lines
+EDGE_KERNEL = np.ones((3, 3), np.uint8)
+REGION_KERNEL = np.ones((7, 7), np.uint8)
+
+def find_potential_qr_regions(gray, settings=qr_detection_settings, buffers=None):
+    """Find square patches of dense dark/light edges (QR codes) that are lit like a screen.
+
+    Works on a half-size copy of the grayscale frame. The code itself is
+    looked for rather than the tablet screen around it, so screens of any
+    shape and size work. Returns padded (x, y, w, h) boxes in full-frame
+    coordinates, largest first. With a DecodeBuffers the half-size copy and
+    masks are written into its arrays.
+    """
+    height, width = gray.shape[:2]
+    if buffers is None:
+        small = cv2.resize(gray, (width // 2, height // 2), interpolation=cv2.INTER_AREA)
+        gradient = cv2.morphologyEx(small, cv2.MORPH_GRADIENT, EDGE_KERNEL)
+        _, mask = cv2.threshold(gradient, settings["edge_threshold"], 255, cv2.THRESH_BINARY)
+        closed = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, REGION_KERNEL)
+        mask = cv2.morphologyEx(closed, cv2.MORPH_OPEN, REGION_KERNEL)
+    else:
+        small = cv2.resize(gray, (width // 2, height // 2), dst=buffers.small, interpolation=cv2.INTER_AREA)
+        gradient = cv2.morphologyEx(small, cv2.MORPH_GRADIENT, EDGE_KERNEL, dst=buffers.gradient)
+        cv2.threshold(gradient, settings["edge_threshold"], 255, cv2.THRESH_BINARY, dst=buffers.mask)
+        closed = cv2.morphologyEx(buffers.mask, cv2.MORPH_CLOSE, REGION_KERNEL, dst=buffers.closed)
+        mask = cv2.morphologyEx(closed, cv2.MORPH_OPEN, REGION_KERNEL, dst=buffers.mask)
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    regions = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if min(w, h) * 2 < settings["min_rect_size"] or max(w, h) * 2 > settings["max_rect_size"]:
+            continue
+        if max(w, h) / min(w, h) > settings["rect_aspect_ratio"]:
+            continue
+        # Pad so the quiet zone around the code is kept
+        pad = max(w, h) // 5
+        x0, y0 = max(0, x - pad), max(0, y - pad)
+        x1, y1 = min(width // 2, x + w + pad), min(height // 2, y + h + pad)
+        # The light modules and quiet zone are screen-bright, unlike most printed or textured clutter
+        if cv2.minMaxLoc(small[y0:y1, x0:x1])[1] < settings["brightness_threshold"]:
+            continue
+        regions.append((x0 * 2, y0 * 2, (x1 - x0) * 2, (y1 - y0) * 2))
+
+    regions.sort(key=lambda region: region[2] * region[3], reverse=True)
+    return regions
+
+def zbar_image(array):
+    """Wrap a C-contiguous 8-bit grayscale array as the (pixels, width, height) tuple pyzbar
+    accepts, so zbar reads the array in place instead of a tobytes() copy"""
+    height, width = array.shape
+    return (ctypes.c_ubyte * (width * height)).from_buffer(array), width, height
+
+# Model files for the WeChat CNN decoder, optional, from github.com/WeChatCV/opencv_3rdparty (wechat_qrcode)
+WECHAT_MODEL_DIR = os.path.join(get_application_path(), "models", "wechat_qrcode")
+WECHAT_MODEL_FILES = ("detect.prototxt", "detect.caffemodel", "sr.prototxt", "sr.caffemodel")
+
+class QRDecoder:
+    """Decoder backend interface: decode(gray) returns the text of every QR code found.
+
+    gray is a C-contiguous 8-bit grayscale array. Instances are not shared
+    between threads, every decoder worker creates its own.
+    """
+
+    name = None
+
+    @classmethod
+    def available(cls):
+        """Whether this backend can run on this machine"""
+        return True
+
+    def decode(self, gray):
+        raise NotImplementedError
+
+class ZbarDecoder(QRDecoder):
+    """pyzbar, limited to QR symbols and reading the array in place"""
+
+    name = "zbar"
+
+    @classmethod
+    def available(cls):
+        return decode is not None
+
+    def decode(self, gray):
+        return [code.data.decode('utf-8') for code in decode(zbar_image(gray), symbols=[ZBarSymbol.QRCODE])]
+
+class OpenCVDecoder(QRDecoder):
+    """OpenCV's QRCodeDetector"""
+
+    name = "opencv"
+
+    def __init__(self):
+        self.detector = cv2.QRCodeDetector()
+
+    def decode(self, gray):
+        found, texts, _, _ = self.detector.detectAndDecodeMulti(gray)
+        return [text for text in texts if text] if found else []
+
+class WeChatDecoder(QRDecoder):
+    """OpenCV contrib's WeChat CNN detector with super-resolution, when its models are installed"""
+
+    name = "wechat"
+
+    @classmethod
+    def available(cls):
+        return (hasattr(cv2, "wechat_qrcode_WeChatQRCode")
+                and all(os.path.exists(os.path.join(WECHAT_MODEL_DIR, name)) for name in WECHAT_MODEL_FILES))
+
+    def __init__(self):
+        self.detector = cv2.wechat_qrcode_WeChatQRCode(*(os.path.join(WECHAT_MODEL_DIR, name)
+                                                         for name in WECHAT_MODEL_FILES))
+
+    def decode(self, gray):
+        texts, _ = self.detector.detectAndDecode(gray)
+        return [text for text in texts if text]
+
+DECODER_BACKENDS = {backend.name: backend for backend in (ZbarDecoder, OpenCVDecoder, WeChatDecoder)}
+
+def available_decoders():
+    """Names of the decoder backends that can run here, in preference order"""
+    return [name for name, backend in DECODER_BACKENDS.items() if backend.available()]
+
+def benchmark_samples():
+    """Synthetic (gray image, expected text) pairs: scan-sized codes in whole frames and region crops.
+
+    Smart focus decodes most frames as candidate-region crops, so besides two
+    whole frames (sharp, and soft and dim) there are crops padded like
+    find_potential_qr_regions pads them: small, low-contrast, and tilted
+    with sensor noise.
+    """
+    text = ",".join(["2025test_qm1" if field == "matchKey" else "1" for field in SCAN_FIELDS])
+    code = cv2.QRCodeEncoder.create().encode(text)
+    noise = np.random.default_rng(0)
+    samples = []
+    # (scale, blur, contrast, tilt degrees, noise sigma, whole frame)
+    for scale, blur, contrast, tilt, sigma, whole_frame in (
+            (4, 0, 1.0, 0, 0, True), (4, 3, 0.6, 0, 0, True), (4, 0, 1.0, 0, 0, False), (4, 3, 0.6, 0, 0, False),
+            (2.5, 0, 1.0, 0, 0, False), (4, 0, 0.35, 0, 0, False), (2.5, 0, 0.6, 10, 8, False),
+            (2, 0, 0.6, 20, 8, False)):
+        tile = cv2.resize(code, None, fx=scale, fy=scale, interpolation=cv2.INTER_NEAREST)
+        tile = cv2.GaussianBlur(tile, (blur, blur), 0) if blur else tile
+        tile = cv2.convertScaleAbs(tile, alpha=contrast, beta=60 * (1 - contrast))
+        frame = np.full((480, 640), 90, np.uint8)
+        y, x = (480 - tile.shape[0]) // 2, (640 - tile.shape[1]) // 2
+        frame[y:y + tile.shape[0], x:x + tile.shape[1]] = tile
+        if not whole_frame:
+            pad = max(tile.shape) // 5
+            frame = frame[y - pad:y + tile.shape[0] + pad, x - pad:x + tile.shape[1] + pad]
+            height, width = frame.shape
+            rotation = cv2.getRotationMatrix2D((width / 2, height / 2), tilt, 1.0)
+            frame = cv2.warpAffine(frame, rotation, (width, height), borderMode=cv2.BORDER_REPLICATE)
+        if sigma:
+            frame = np.clip(frame + noise.normal(0, sigma, frame.shape), 0, 255).astype(np.uint8)
+        samples.append((frame, text))
+    return samples
+
+def choose_decoder_backend(samples=None, repeats=3):
+    """Benchmark every available backend and return (name, {name: ms per sample or None}, {name: samples read}).
+
+    The backend that reads the most samples wins, the fastest of those on a
+    tie, so a backend that misses crops can't win on speed alone. A backend
+    that fails to run gets None and 0.
+    """
+    samples = benchmark_samples() if samples is None else samples
+    names = available_decoders()
+    if not names:
+        raise RuntimeError("No QR decoder backend available, install pyzbar or opencv-python")
+    timings = {}
+    reads = {}
+    for name in names:
+        try:
+            decoder = DECODER_BACKENDS[name]()
+            decoder.decode(samples[0][0])  # Warm up, the first call may load models
+            best = None
+            for _ in range(repeats):
+                start = time.perf_counter()
+                read = sum(expected in decoder.decode(image) for image, expected in samples)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            timings[name] = round(best * 1000 / len(samples), 2)
+            reads[name] = read
+        except Exception as e:
+            log.warning("Decoder backend %s failed its benchmark: %s", name, e)
+            timings[name] = None
+            reads[name] = 0
+    measured = [name for name in names if timings[name] is not None]
+    chosen = min(measured, key=lambda name: (-reads[name], timings[name])) if measured else names[0]
+    log.info("Decoder benchmark (ms per sample): %s, samples read of %d: %s, using %s",
+             timings, len(samples), reads, chosen)
+    return chosen, timings, reads
+
+def frame_quality(gray, regions=(), buffers=None):
+    """Return (sharpness, glare) of a grayscale frame, measured on a quarter-size copy.
+
+    sharpness is the variance of the Laplacian, which motion blur and defocus
+    pull down. glare is the largest fraction of a candidate region's code
+    covered by clipped (>= 250) blobs wider than a few modules. The padding
+    around each code is left out and single light modules are opened away, so
+    a bright white tablet screen does not count as glare; with no candidate
+    regions there is nothing glare could hide and it is 0.
+    """
+    height, width = gray.shape[:2]
+    if buffers is None:
+        thumbnail = cv2.resize(gray, (width // 4, height // 4), interpolation=cv2.INTER_AREA)
+        laplacian = cv2.Laplacian(thumbnail, cv2.CV_16S)
+        _, clipped = cv2.threshold(thumbnail, 249, 255, cv2.THRESH_BINARY)
+        blobs = np.empty_like(clipped)
+    else:
+        thumbnail = cv2.resize(gray, (width // 4, height // 4), dst=buffers.thumbnail, interpolation=cv2.INTER_AREA)
+        laplacian = cv2.Laplacian(thumbnail, cv2.CV_16S, dst=buffers.laplacian)
+        _, clipped = cv2.threshold(thumbnail, 249, 255, cv2.THRESH_BINARY, dst=buffers.clipped)
+        blobs = buffers.blobs
+    _, stddev = cv2.meanStdDev(laplacian)
+    glare = 0.0
+    for x, y, w, h in regions:
+        # Regions are padded by a fifth of the code on each side, about a seventh of their size
+        x0, y0 = (x + w // 7) // 4, (y + h // 7) // 4
+        x1, y1 = (x + w - w // 7) // 4, (y + h - h // 7) // 4
+        if x1 <= x0 or y1 <= y0:
+            continue
+        # A code is at least 21 modules plus a 4 module quiet zone, so a blob this wide spans several modules
+        size = max(3, min(x1 - x0, y1 - y0) // 6)
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (size, size))
+        covered = cv2.morphologyEx(clipped[y0:y1, x0:x1], cv2.MORPH_OPEN, kernel, dst=blobs[y0:y1, x0:x1])
+        glare = max(glare, cv2.countNonZero(covered) / covered.size)
+    return float(stddev[0][0]) ** 2, glare
+
+class DecodeBuffers:
+    """Grayscale, crop and mask arrays one decoder thread reuses for every frame.
+
+    Arrays are only reallocated when the frame size changes, so steady-state
+    decoding writes every intermediate image into memory it already owns.
+    """
+
+    def __init__(self, settings=qr_detection_settings):
+        self.shape = None
+        self.scratch_buffers = [np.empty(0, np.uint8), np.empty(0, np.uint8)]
+        self.clahe = cv2.createCLAHE(clipLimit=settings["clahe_clip_limit"], tileGridSize=(8, 8))
+
+    @property
+    def nbytes(self):
+        arrays = [value for value in vars(self).values() if isinstance(value, np.ndarray)]
+        return sum(array.nbytes for array in arrays + self.scratch_buffers)
+
+    def fit(self, shape):
+        """Make sure the arrays match a frame of this shape"""
+        height, width = shape[:2]
+        if self.shape == (height, width):
+            return
+        self.shape = (height, width)
+        self.gray = np.empty((height, width), np.uint8)
+        self.crop_buffer = np.empty(height * width, np.uint8)  # crops are packed at the front
+        self.small = np.empty((height // 2, width // 2), np.uint8)
+        self.gradient = np.empty_like(self.small)
+        self.mask = np.empty_like(self.small)
+        self.closed = np.empty_like(self.small)
+        self.thumbnail = np.empty((height // 4, width // 4), np.uint8)
+        self.laplacian = np.empty(self.thumbnail.shape, np.int16)
+        self.clipped = np.empty_like(self.thumbnail)
+        self.blobs = np.empty_like(self.thumbnail)
+
+    def crop(self, x, y, w, h):
+        """Copy a region of gray into a contiguous (h, w) view of the crop buffer"""
+        view = self.crop_buffer[:w * h].reshape(h, w)
+        np.copyto(view, self.gray[y:y + h, x:x + w])
+        return view
+
+    def scratch(self, index, h, w):
+        """Return a contiguous (h, w) view of scratch buffer index, growing the buffer if it is too small"""
+        if self.scratch_buffers[index].size < h * w:
+            self.scratch_buffers[index] = np.empty(h * w, np.uint8)
+        return self.scratch_buffers[index][:h * w].reshape(h, w)
+
+class FrameRing:
+    """Fixed pool of preallocated frames shared by the camera, decoder and display.
+
+    The camera thread reads straight into a free slot and publishes it. Readers
+    pin the newest published slot while they use it, so a slot is never
+    overwritten underneath them and no frame is ever copied or re-encoded.
+    """
+
+    def __init__(self, shape, slots=6):
+        self.frames = [np.zeros(shape, dtype=np.uint8) for _ in range(slots)]
+        self.published_at = [0.0] * slots  # perf_counter() when each slot was published
+        self.captured_at = [0.0] * slots   # monotonic() time of each slot's frame, or the replayed frame time
+        self._pins = [0] * slots
+        self._seqs = [0] * slots
+        self._latest = -1
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def acquire_write(self):
+        """Return the index of a slot the camera may overwrite, or None if all are pinned"""
+        with self._lock:
+            for offset in range(1, len(self.frames) + 1):
+                index = (self._latest + offset) % len(self.frames)
+                if index != self._latest and self._pins[index] == 0:
+                    return index
+        return None
+
+    def publish(self, index, captured_at=None):
+        """Make a freshly written slot the latest frame and return its sequence number"""
+        with self._lock:
+            self._seq += 1
+            self._seqs[index] = self._seq
+            self.published_at[index] = time.perf_counter()
+            self.captured_at[index] = time.monotonic() if captured_at is None else captured_at
+            self._latest = index
+            return self._seq
+
+    def acquire_latest(self):
+        """Pin the latest frame and return (index, seq, frame), or None before the first frame"""
+        with self._lock:
+            if self._latest < 0:
+                return None
+            index = self._latest
+            self._pins[index] += 1
+            return index, self._seqs[index], self.frames[index]
+
+    def release(self, index):
+        """Unpin a slot returned by acquire_latest"""
+        with self._lock:
+            self._pins[index] -= 1
+
+class RateMeter:
+    """Count events and report a frames-per-second figure over a sliding window"""
+
+    def __init__(self, window=5.0):
+        self.window = window
+        self._count = 0
+        self._start = time.perf_counter()
+        self._rate = 0.0
+
+    def tick(self):
+        self._count += 1
+        elapsed = time.perf_counter() - self._start
+        if elapsed >= self.window:
+            self._rate = self._count / elapsed
+            self._count = 0
+            self._start = time.perf_counter()
+
+    def rate(self):
+        return self._rate
+
+# Upper bounds of the latency histogram buckets, 0.1 ms doubling up to about 13 s
+LATENCY_BUCKETS_MS = [0.1 * 2 ** i for i in range(18)]
+
+# Stages of the scan pipeline, in the order a frame goes through them
+PIPELINE_STAGES = (
+    "capture",         # camera read into a ring slot
+    "frame_handoff",   # slot published until a decoder claims it
+    "preprocess",      # grayscale conversion and candidate regions
+    "qr_decode",       # decoder backend on the frame or its regions
+    "fallback",        # preprocessing tiers retrying regions the raw decode missed
+    "result_handoff",  # decoder result until the scan handler picks it up
+    "parse",           # session ingest: assembly, dedupe, parse, tracking
+    "persist",         # scan store transaction on the writer thread
+    "ui",              # scan handler work besides parse: labels, messages, sounds
+    "preview",         # drawing one preview frame
+)
+
+class LatencyHistogram:
+    """Rolling latency histogram covering the last one to two windows.
+
+    Samples are counted in the log-spaced LATENCY_BUCKETS_MS, so recording
+    is constant time and memory is fixed; percentiles are reported as the
+    upper bound of the bucket they fall in.
+    """
+
+    def __init__(self, window=60.0):
+        self.window = window
+        self._current = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self._previous = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self._current_max = 0.0
+        self._previous_max = 0.0
+        self._rotated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _rotate(self, now):
+        if now - self._rotated < self.window:
+            return
+        if now - self._rotated < 2 * self.window:
+            self._previous, self._previous_max = self._current, self._current_max
+        else:
+            self._previous, self._previous_max = [0] * len(self._current), 0.0
+        self._current, self._current_max = [0] * len(self._current), 0.0
+        self._rotated = now
+
+    def record(self, seconds):
+        milliseconds = seconds * 1000
+        bucket = bisect.bisect_left(LATENCY_BUCKETS_MS, milliseconds)
+        with self._lock:
+            self._rotate(time.monotonic())
+            self._current[bucket] += 1
+            self._current_max = max(self._current_max, milliseconds)
+
+    def snapshot(self):
+        """Return {"count", "p50", "p90", "p99", "max"} with latencies in milliseconds"""
+        with self._lock:
+            self._rotate(time.monotonic())
+            counts = [a + b for a, b in zip(self._current, self._previous)]
+            largest = max(self._current_max, self._previous_max)
+        total = sum(counts)
+        result = {"count": total}
+        for name, fraction in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99)):
+            if not total:
+                result[name] = 0.0
+                continue
+            target = fraction * total
+            seen = 0
+            for bucket, count in enumerate(counts):
+                seen += count
+                if seen >= target:
+                    break
+            bound = LATENCY_BUCKETS_MS[bucket] if bucket < len(LATENCY_BUCKETS_MS) else largest
+            result[name] = round(min(bound, largest), 2)
+        result["max"] = round(largest, 2)
+        return result
+
+class PipelineMetrics:
+    """Rolling latency histograms for every PIPELINE_STAGES stage.
+
+    record() is safe to call from any thread. write() appends a snapshot of
+    every stage to a JSON-lines metrics file.
+    """
+
+    def __init__(self, stages=PIPELINE_STAGES, window=60.0):
+        self.histograms = {stage: LatencyHistogram(window) for stage in stages}
+
+    def record(self, stage, seconds):
+        self.histograms[stage].record(seconds)
+
+    def snapshot(self):
+        return {stage: histogram.snapshot() for stage, histogram in self.histograms.items()}
+
+    def write(self, path=METRICS_FILE):
+        """Append the current snapshot to the metrics file"""
+        line = {"time": datetime.datetime.now().isoformat(timespec="seconds"), "stages": self.snapshot()}
+        try:
+            with open(path, 'a') as f:
+                f.write(json.dumps(line) + "\n")
+        except OSError as e:
+            log.warning("Error writing metrics: %s", e)
+
+# Shared by the capture, decoder, store and UI threads
+pipeline_metrics = PipelineMetrics(window=metrics_settings["window"])
+
+def process_rss():
+    """Resident memory of this process in bytes, or None if it can't be read"""
+    if psutil is not None:
+        return psutil.Process(os.getpid()).memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+class MemoryBudget:
+    """Keeps resident memory under memory_settings["budget_mb"].
+
+    Owners of in-memory caches register a release callback with add_release().
+    check(), called every check_interval seconds, measures RSS and calls every
+    callback while the process is over budget. The frame, decode and preview
+    buffers are preallocated and reused, so steady-state growth means a cache
+    or a leak; with tracemalloc on, each check logs the allocation sites that
+    grew since the previous check to find which.
+    """
+
+    def __init__(self, settings=memory_settings):
+        self.settings = settings
+        self.rss = None
+        self.over_budget = False
+        self._releases = []   # (name, callback)
+        self._snapshot = None
+        if settings["tracemalloc"] and not tracemalloc.is_tracing():
+            tracemalloc.start(settings["tracemalloc_frames"])
+
+    def add_release(self, name, callback):
+        """Register callback() to free memory when over budget"""
+        self._releases.append((name, callback))
+
+    def check(self):
+        """Measure RSS, release caches if over budget, and return RSS in bytes (or None)"""
+        self.rss = process_rss()
+        if tracemalloc.is_tracing():
+            self.log_growth()
+        if self.rss is None:
+            return None
+        budget = self.settings["budget_mb"] * 1024 * 1024
+        self.over_budget = self.rss > budget
+        log.debug("Memory usage: %.1f MB of %d MB", self.rss / 1048576, self.settings["budget_mb"])
+        if self.over_budget:
+            for name, callback in self._releases:
+                try:
+                    callback()
+                except Exception as e:
+                    log.warning("Error releasing %s: %s", name, e)
+            log.warning("Memory usage %.0f MB is over the %d MB budget, released %s", self.rss / 1048576,
+                        self.settings["budget_mb"], ", ".join(name for name, _ in self._releases) or "nothing")
+        return self.rss
+
+    def log_growth(self):
+        """Log the allocation sites that grew the most since the previous call"""
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        if self._snapshot is not None:
+            growth = [stat for stat in snapshot.compare_to(self._snapshot, "lineno") if stat.size_diff > 0]
+            current, peak = tracemalloc.get_traced_memory()
+            log.info("Traced memory %.1f MB (peak %.1f MB), top growth:", current / 1048576, peak / 1048576)
+            for stat in growth[:self.settings["tracemalloc_top"]]:
+                frame = stat.traceback[0]
+                log.info("  %s:%d +%.1f KB (%+d blocks)", frame.filename, frame.lineno,
+                         stat.size_diff / 1024, stat.count_diff)
+        self._snapshot = snapshot
+
+class DecodeWorkerPool:
+    """Bounded pool of decoder threads that always works on the newest frame.
+
+    Capture threads call submit() after publishing a frame. Workers take the
+    latest frame of each camera ring and skip anything older than a frame that
+    was already claimed, so when decoding is slower than capture stale frames
+    are dropped instead of queueing up. Only frames with QR codes are reported
+    through on_result, which is called from the worker thread.
+
+    Frames failing the blur and glare quality gate are not decoded. When a
+    camera's QUALITY_HINTS key changes, on_quality(camera, hint or None) is
+    called from the worker thread.
+    """
+
+    def __init__(self, on_result, workers=DECODE_WORKERS, backend=None, on_quality=None):
+        self.on_result = on_result
+        self.on_quality = on_quality
+        self.workers = workers
+        self.low_quality_frames = 0
+        self.tier_hits = dict.fromkeys(FALLBACK_TIERS, 0)  # tier -> frames it decoded
+        self.tier_costs = dict.fromkeys(FALLBACK_TIERS, 0.0)  # tier -> running mean seconds per crop pixel per image
+        self.frames_decoded = {}  # camera -> frames that passed the quality gate, paces full-frame decodes
+        self.quality = {}         # camera -> (sharpness, glare) of its latest decoded frame
+        self.quality_hints = {}   # camera -> QUALITY_HINTS key of its latest frame, or None
+        self._quality_retry = {}  # camera -> frame time a low-quality frame was last decoded anyway
+        self.backend = backend or qr_detection_settings["decoder_backend"]
+        self.active_backend = None  # Backend in use, chosen by the first worker when "auto"
+        self.benchmark = {}         # backend -> ms per sample from the last startup benchmark
+        self.benchmark_reads = {}   # backend -> benchmark samples it read
+        self._backend_lock = threading.Lock()
+        self.dropped_frames = 0
+        self.decode_rate = RateMeter()
+        self.camera_decode_rates = {}  # camera -> RateMeter
+        self.regions = {}    # camera -> candidate regions found in its latest decoded frame
+        self._cond = threading.Condition()
+        self._pending = {}   # camera -> ring with a frame nobody has claimed yet
+        self._claimed = {}   # camera -> sequence number of the last claimed frame
+        self._rings = {}     # camera -> ring it last submitted, a new ring restarts its sequence numbers
+        self._threads = []
+        self._running = False
+        self._local = threading.local()
+        self._buffers = []   # DecodeBuffers of every worker thread, for buffer_bytes()
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"qr-decode-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._pending.clear()
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=2)
+        self._threads = []
+
+    def submit(self, camera, ring):
+        """Tell the workers a new frame is waiting in ring, replacing any unclaimed one"""
+        with self._cond:
+            if not self._running:
+                return
+            if self._rings.get(camera) is not ring:
+                # The camera was restarted with a fresh ring, its sequence numbers start again at 1
+                self._rings[camera] = ring
+                self._claimed[camera] = 0
+            self._pending[camera] = ring
+            self._cond.notify()
+
+    def claimed_seq(self, camera):
+        """Sequence number of the newest frame a worker has taken from camera"""
+        with self._cond:
+            return self._claimed.get(camera, 0)
+
+    def buffers(self):
+        """Return the calling thread's DecodeBuffers, creating them on first use"""
+        buffers = getattr(self._local, "buffers", None)
+        if buffers is None:
+            buffers = self._local.buffers = DecodeBuffers()
+            with self._cond:
+                self._buffers.append(buffers)
+        return buffers
+
+    def set_backend(self, backend):
+        """Switch decoder backend, workers pick it up on their next frame"""
+        with self._backend_lock:
+            self.backend = backend
+            self.active_backend = None
+
+    def resolve_backend(self):
+        """Return the backend in use, benchmarking once for "auto" or an unavailable backend"""
+        with self._backend_lock:
+            if self.active_backend is None:
+                backend = self.backend
+                if backend != "auto" and not (backend in DECODER_BACKENDS and DECODER_BACKENDS[backend].available()):
+                    log.warning("Decoder backend %s is not available, choosing one automatically", backend)
+                    backend = "auto"
+                if backend == "auto":
+                    backend, self.benchmark, self.benchmark_reads = choose_decoder_backend()
+                self.active_backend = backend
+            return self.active_backend
+
+    def decoder(self):
+        """Return the calling thread's instance of the backend in use"""
+        backend = self.resolve_backend()
+        if getattr(self._local, "backend", None) != backend:
+            self._local.decoder = DECODER_BACKENDS[backend]()
+            self._local.backend = backend
+        return self._local.decoder
+
+    def buffer_bytes(self):
+        """Bytes held by the decoder threads' reusable buffers"""
+        with self._cond:
+            return sum(buffers.nbytes for buffers in self._buffers)
+
+    def _claim(self):
+        """Wait for and pin the newest unclaimed frame, or return None when stopping"""
+        with self._cond:
+            while True:
+                while self._running and not self._pending:
+                    self._cond.wait()
+                if not self._running:
+                    return None
+                # Take cameras in submission order so one busy camera can't starve another
+                camera = next(iter(self._pending))
+                ring = self._pending.pop(camera)
+                latest = ring.acquire_latest()
+                if latest is None:
+                    continue
+                index, seq, frame = latest
+                last_seq = self._claimed.get(camera, 0)
+                if seq <= last_seq:
+                    ring.release(index)
+                    continue
+                self.dropped_frames += max(0, seq - last_seq - 1)
+                self._claimed[camera] = seq
+                return camera, ring, index, seq, frame
+
+    def _worker(self):
+        while True:
+            claimed = self._claim()
+            if claimed is None:
+                return
+            camera, ring, index, seq, frame = claimed
+            pipeline_metrics.record("frame_handoff", time.perf_counter() - ring.published_at[index])
+            try:
+                codes = self.decode_frame(frame, camera, seq, ring.captured_at[index])
+            except Exception as e:
+                log.warning("Error decoding frame from camera %s: %s", camera, e,
+                            exc_info=log.isEnabledFor(logging.DEBUG))
+                codes = []
+            finally:
+                ring.release(index)
+            self.decode_rate.tick()
+            self.camera_decode_rates.setdefault(camera, RateMeter()).tick()
+            if codes:
+                self.on_result({"camera": camera, "seq": seq, "codes": codes, "decoded_at": time.perf_counter()})
+
+    def decode_frame(self, frame, camera, seq, captured_at=None):
+        """Return the text of every QR code found in a BGR frame, using the pool's decoder backend.
+
+        With smart focus on, only candidate regions are decoded and the whole
+        frame is decoded every full_frame_interval decoded frames of the
+        camera as a fallback. Claimed sequence numbers skip dropped and gated
+        frames, so the count is kept here rather than taken from seq.
+        captured_at is the frame's time (see FrameRing.captured_at), which
+        paces the quality gate's retries.
+        """
+        decoder = self.decoder()
+        start = time.perf_counter()
+        buffers = self.buffers()
+        buffers.fit(frame.shape)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=buffers.gray)
+        settings = qr_detection_settings
+        if (settings["focus_enabled"] or settings["highlight_potential"] or settings["fallback_enabled"]
+                or settings["quality_gate_enabled"]):
+            regions = find_potential_qr_regions(gray, settings, buffers)
+        else:
+            regions = []
+        self.regions[camera] = regions
+        if settings["quality_gate_enabled"] and self.skip_low_quality(gray, camera, regions, buffers, captured_at):
+            pipeline_metrics.record("preprocess", time.perf_counter() - start)
+            return []
+        decode_start = time.perf_counter()
+        pipeline_metrics.record("preprocess", decode_start - start)
+
+        decoded = self.frames_decoded[camera] = self.frames_decoded.get(camera, 0) + 1
+        if not settings["focus_enabled"] or decoded % settings["full_frame_interval"] == 0:
+            codes = decoder.decode(gray)
+        else:
+            codes = []
+            for x, y, w, h in regions:
+                for qr_data in decoder.decode(buffers.crop(x, y, w, h)):
+                    if qr_data not in codes:
+                        codes.append(qr_data)
+        fallback_start = time.perf_counter()
+        pipeline_metrics.record("qr_decode", fallback_start - decode_start)
+
+        if codes:
+            self.tier_hits["raw"] += 1
+        elif settings["fallback_enabled"] and regions:
+            codes = self.decode_fallback(decoder, buffers, regions[:settings["fallback_regions"]])
+            pipeline_metrics.record("fallback", time.perf_counter() - fallback_start)
+        return codes
+
+    def decode_fallback(self, decoder, buffers, regions):
+        """Retry candidate regions through the FALLBACK_TIERS after "raw" until one decodes.
+
+        Every tier tries every region before the next, stronger tier runs.
+        An image is only preprocessed and decoded if the tier's running mean
+        cost per crop pixel says it finishes inside what is left of
+        fallback_budget_ms, so a tier too slow for the time left is skipped
+        rather than overrunning. Only a tier's first, unmeasured image can
+        overrun the budget.
+        """
+        settings = qr_detection_settings
+        deadline = time.perf_counter() + settings["fallback_budget_ms"] / 1000
+        for tier in FALLBACK_TIERS[1:]:
+            codes = []
+            for x, y, w, h in regions:
+                crop = buffers.crop(x, y, w, h)
+                images = self.fallback_images(tier, crop, buffers, settings)
+                while True:
+                    image_start = time.perf_counter()
+                    if image_start + self.tier_costs[tier] * w * h > deadline:
+                        break
+                    image = next(images, None)
+                    if image is None:
+                        break
+                    for qr_data in decoder.decode(image):
+                        if qr_data not in codes:
+                            codes.append(qr_data)
+                    cost = (time.perf_counter() - image_start) / (w * h)
+                    previous = self.tier_costs[tier]
+                    self.tier_costs[tier] = cost if not previous else 0.8 * previous + 0.2 * cost
+            if codes:
+                self.tier_hits[tier] += 1
+                return codes
+        return []
+
+    @staticmethod
+    def fallback_images(tier, crop, buffers, settings=qr_detection_settings):
+        """Yield the preprocessed versions of a grayscale crop one fallback tier decodes"""
+        h, w = crop.shape
+        if tier == "stretch":
+            # Map the darkest 2% to black and anything as bright as a screen to white
+            histogram = cv2.calcHist([crop], [0], None, [256], [0, 256]).cumsum()
+            black = int(np.searchsorted(histogram, histogram[-1] * 0.02))
+            white = min(int(np.searchsorted(histogram, histogram[-1] * 0.98)), settings["brightness_threshold"])
+            if white - black >= 16:
+                alpha = 255.0 / (white - black)
+                yield cv2.convertScaleAbs(crop, dst=buffers.scratch(0, h, w), alpha=alpha, beta=-black * alpha)
+        elif tier == "clahe":
+            yield buffers.clahe.apply(crop, buffers.scratch(0, h, w))
+        elif tier == "adaptive":
+            yield cv2.adaptiveThreshold(crop, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY,
+                                        settings["adaptive_block_size"], 5, dst=buffers.scratch(0, h, w))
+        elif tier == "upsample":
+            for scale in settings["fallback_scales"]:
+                size = (int(w * scale), int(h * scale))
+                yield cv2.resize(crop, size, dst=buffers.scratch(1, size[1], size[0]), interpolation=cv2.INTER_CUBIC)
+
+    def skip_low_quality(self, gray, camera, regions=(), buffers=None, now=None):
+        """Score a frame and return True if it is too blurred or glared to be worth decoding.
+
+        A low-quality frame is still decoded every quality_retry_interval
+        seconds of frame time, so thresholds that are wrong for a camera slow
+        scanning down rather than stopping it. now is the frame's time and
+        defaults to time.monotonic().
+        """
+        settings = qr_detection_settings
+        sharpness, glare = frame_quality(gray, regions, buffers)
+        self.quality[camera] = (sharpness, glare)
+        if glare > settings["glare_threshold"]:
+            hint = "glare"
+        elif sharpness < settings["blur_threshold"]:
+            hint = "blur"
+        else:
+            hint = None
+        if hint != self.quality_hints.get(camera):
+            self.quality_hints[camera] = hint
+            if self.on_quality is not None:
+                self.on_quality(camera, hint)
+        if hint is None:
+            return False
+        now = time.monotonic() if now is None else now
+        last_retry = self._quality_retry.get(camera)
+        if last_retry is None or now - last_retry >= settings["quality_retry_interval"]:
+            self._quality_retry[camera] = now
+            return False
+        self.low_quality_frames += 1
+        return True
+
+class MotionGate:
+    """Cheap frame-difference and presence detector that paces decoding.
+
+    Each frame is shrunk to an 80x60 grayscale thumbnail. Motion against the
+    previous thumbnail, or a difference from a slowly learned background (a
+    tablet being held still), keeps decoding at full rate. A static empty
+    scene only gets a decode every idle_decode_interval seconds. Thumbnails
+    live in preallocated arrays, the current and previous ones swap places.
+    on_change(active) is called from the capture thread when active flips.
+    """
+
+    def __init__(self, settings=qr_detection_settings, on_change=None):
+        self.settings = settings
+        self.on_change = on_change
+        self.active = True
+        self._started = False
+        self._thumbnail = np.empty((60, 80, 3), np.uint8)
+        self._thumbnail_gray = np.empty((60, 80), np.uint8)
+        self._current = np.empty((60, 80), np.float32)
+        self._previous = np.empty((60, 80), np.float32)
+        self._background = np.empty((60, 80), np.float32)
+        self._difference = np.empty((60, 80), np.float32)
+        self._active_until = 0.0
+        self._last_decode = None
+
+    def should_decode(self, frame, now=None):
+        """Return True if this frame should be sent to the decoder.
+
+        now is the frame's time, such as FrameRing.captured_at, and defaults
+        to time.monotonic(). Replays pass frame times so gating is repeatable.
+        """
+        settings = self.settings
+        now = time.monotonic() if now is None else now
+        was_active = self.active
+        if not settings["motion_gate_enabled"]:
+            self.active = True
+            self.report_change(was_active)
+            return True
+
+        cv2.resize(frame, (80, 60), dst=self._thumbnail, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self._thumbnail, cv2.COLOR_BGR2GRAY, dst=self._thumbnail_gray)
+        small = self._current
+        np.copyto(small, self._thumbnail_gray)
+        if not self._started:
+            self._started = True
+            np.copyto(self._background, small)
+            self._active_until = now + settings["active_hold_seconds"]
+        else:
+            motion = cv2.mean(cv2.absdiff(small, self._previous, dst=self._difference))[0]
+            presence = cv2.mean(cv2.absdiff(small, self._background, dst=self._difference))[0]
+            if motion > settings["motion_threshold"] or presence > settings["presence_threshold"]:
+                self._active_until = now + settings["active_hold_seconds"]
+            # Learn slowly so a tablet held still stays "present" for a while,
+            # but a permanent change to the scene is absorbed within a minute
+            cv2.accumulateWeighted(small, self._background, 0.002)
+        self._current, self._previous = self._previous, self._current
+
+        self.active = now < self._active_until
+        self.report_change(was_active)
+        if self.active or self._last_decode is None or now - self._last_decode >= settings["idle_decode_interval"]:
+            self._last_decode = now
+            return True
+        return False
+
+    def report_change(self, was_active):
+        if self.active != was_active and self.on_change is not None:
+            self.on_change(self.active)
+
+# Compact payloads: "SOC1:" + base45(flags byte + optionally deflated packed fields).
+# Base45 only uses QR alphanumeric characters, so these codes encode at 5.5 bits a character.
+# Bundles of several rows use "SOB1:" with a record count in front of the packed rows.
+COMPACT_PREFIX = "SOC1:"
+BUNDLE_PREFIX = "SOB1:"
+BASE45_ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:"
+BASE45_VALUES = {char: value for value, char in enumerate(BASE45_ALPHABET)}
+
+# Field types for the compact format, in CSV_HEADER order. "flag" fields share one bitfield.
+COMPACT_FIELDS = [
+    ("teamNumber", "uint"), ("scouterName", "str"), ("matchKey", "str"), ("allianceColor", "flag"),
+    ("eventKey", "str"), ("station", "uint"), ("matchNumber", "uint"),
+    ("auton_CoralScoringLevel1", "uint"), ("auton_CoralScoringLevel2", "uint"),
+    ("auton_CoralScoringLevel3", "uint"), ("auton_CoralScoringLevel4", "uint"),
+    ("auton_LeftBarge", "flag"), ("auton_AlgaeScoringProcessor", "uint"), ("auton_AlgaeScoringBarge", "uint"),
+    ("botLocation", "str"),
+    ("teleop_CoralScoringLevel1", "uint"), ("teleop_CoralScoringLevel2", "uint"),
+    ("teleop_CoralScoringLevel3", "uint"), ("teleop_CoralScoringLevel4", "uint"),
+    ("teleop_AlgaeScoringBarge", "uint"), ("teleop_AlgaeScoringProcessor", "uint"), ("teleop_AlgaePickUp", "uint"),
+    ("teleop_Defense", "flag"), ("endgame_Deep_Climb", "flag"), ("endgame_Shallow_Climb", "flag"),
+    ("endgame_Park", "flag"), ("endgame_Comments", "str"),
+]
+# Text values of each flag field for bit 0 and bit 1
+COMPACT_FLAG_VALUES = {"allianceColor": ("Red", "Blue")}
+COMPACT_BOOL_VALUES = ("False", "True")
+COMPACT_EVENT_PREFIX_BIT = 1 << 7   # matchKey is stored without its "<eventKey>_" prefix
+COMPACT_DEFLATED = 1                # flags byte: packed fields are raw-deflated
+
+def base45_encode(data):
+    """Encode bytes as RFC 9285 base45 text"""
+    chars = []
+    for i in range(0, len(data) - 1, 2):
+        value = data[i] * 256 + data[i + 1]
+        value, c = divmod(value, 45)
+        e, d = divmod(value, 45)
+        chars.extend((BASE45_ALPHABET[c], BASE45_ALPHABET[d], BASE45_ALPHABET[e]))
+    if len(data) % 2:
+        d, c = divmod(data[-1], 45)
+        chars.extend((BASE45_ALPHABET[c], BASE45_ALPHABET[d]))
+    return "".join(chars)
+
+def base45_decode(text):
+    """Decode RFC 9285 base45 text, raising ValueError on malformed input"""
+    try:
+        values = [BASE45_VALUES[char] for char in text]
+    except KeyError as e:
+        raise ValueError(f"Invalid base45 character {e}")
+    if len(values) % 3 == 1:
+        raise ValueError("Invalid base45 length")
+    data = bytearray()
+    for i in range(0, len(values), 3):
+        group = values[i:i + 3]
+        if len(group) == 3:
+            value = group[0] + group[1] * 45 + group[2] * 45 * 45
+            if value > 0xFFFF:
+                raise ValueError("Invalid base45 group")
+            data.extend(divmod(value, 256))
+        else:
+            value = group[0] + group[1] * 45
+            if value > 0xFF:
+                raise ValueError("Invalid base45 group")
+            data.append(value)
+    return bytes(data)
+
+def _write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def _read_varint(data, pos):
+    value = shift = 0
+    while True:
+        if pos >= len(data) or shift > 63:
+            raise ValueError("Truncated varint")
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+def _pack_row(csv_row, out):
+    """Append the packed flags and fields of one CSV_HEADER row to out"""
+    record = parse_record(csv_row)
+    if record[-1] is None:
+        raise ValueError(f"Expected {len(COMPACT_FIELDS)} fields, got {record.index(None)}")
+    fields = record._asdict()
+
+    flags = 0
+    bit = 0
+    body = bytearray()
+    for name, kind in COMPACT_FIELDS:
+        value = fields[name]
+        if kind == "flag":
+            choices = COMPACT_FLAG_VALUES.get(name, COMPACT_BOOL_VALUES)
+            if value not in choices:
+                raise ValueError(f"{name} must be one of {choices}, got {value!r}")
+            flags |= choices.index(value) << bit
+            bit += 1
+        elif kind == "uint":
+            # A varint can't carry leading zeros or non-ASCII digits, such rows must go as plain CSV
+            if not (value.isascii() and value.isdigit()) or str(int(value)) != value:
+                raise ValueError(f"{name} must be a whole number without leading zeros, got {value!r}")
+            _write_varint(body, int(value))
+        else:
+            if name == "matchKey" and value.startswith(fields["eventKey"] + "_"):
+                flags |= COMPACT_EVENT_PREFIX_BIT
+                value = value[len(fields["eventKey"]) + 1:]
+            encoded = value.encode('utf-8')
+            _write_varint(body, len(encoded))
+            body.extend(encoded)
+
+    _write_varint(out, flags)
+    out.extend(body)
+
+def _unpack_row(data, pos):
+    """Read one packed row starting at pos and return (csv_row, next_pos)"""
+    flags, pos = _read_varint(data, pos)
+    values = []
+    bit = 0
+    for name, kind in COMPACT_FIELDS:
+        if kind == "flag":
+            choices = COMPACT_FLAG_VALUES.get(name, COMPACT_BOOL_VALUES)
+            values.append(choices[(flags >> bit) & 1])
+            bit += 1
+        elif kind == "uint":
+            value, pos = _read_varint(data, pos)
+            values.append(str(value))
+        else:
+            length, pos = _read_varint(data, pos)
+            if pos + length > len(data):
+                raise ValueError("Truncated compact payload")
+            values.append(data[pos:pos + length].decode('utf-8'))
+            pos += length
+
+    if flags & COMPACT_EVENT_PREFIX_BIT:
+        match_key = [name for name, _ in COMPACT_FIELDS].index("matchKey")
+        event_key = [name for name, _ in COMPACT_FIELDS].index("eventKey")
+        values[match_key] = f"{values[event_key]}_{values[match_key]}"
+    return ','.join(values), pos
+
+def _seal(prefix, packed):
+    """Deflate packed bytes when that makes them smaller and wrap them as prefixed base45 text"""
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -15)
+    deflated = compressor.compress(bytes(packed)) + compressor.flush()
+    if len(deflated) < len(packed):
+        return prefix + base45_encode(bytes([COMPACT_DEFLATED]) + deflated)
+    return prefix + base45_encode(bytes([0]) + bytes(packed))
+
+def _unseal(prefix, payload):
+    """Reverse _seal, raising ValueError if the payload is malformed"""
+    if not payload.startswith(prefix):
+        raise ValueError(f"Payload does not start with {prefix}")
+    data = base45_decode(payload[len(prefix):])
+    if not data:
+        raise ValueError("Empty compact payload")
+    if data[0] & COMPACT_DEFLATED:
+        try:
+            return zlib.decompress(data[1:], -15)
+        except zlib.error as e:
+            raise ValueError(f"Corrupt compact payload: {e}")
+    return data[1:]
+
+def encode_compact(csv_row):
+    """Reference encoder: turn a CSV_HEADER row into a compact "SOC1:" payload.
+
+    Raises ValueError if a field does not fit its compact type (for example a
+    non-numeric counter); the tablet should then send the plain CSV row.
+    """
+    packed = bytearray()
+    _pack_row(csv_row, packed)
+    return _seal(COMPACT_PREFIX, packed)
+
+def decode_compact(payload):
+    """Decode a compact "SOC1:" payload back into a CSV_HEADER row, raising ValueError if invalid"""
+    data = _unseal(COMPACT_PREFIX, payload)
+    row, pos = _unpack_row(data, 0)
+    if pos != len(data):
+        raise ValueError("Trailing bytes in compact payload")
+    return row
+
+def encode_bundle(csv_rows, compact=True):
+    """Reference encoder: carry several CSV_HEADER rows in one payload.
+
+    Compact bundles are "SOB1:" payloads and raise ValueError like
+    encode_compact; plain bundles are the rows joined by newlines. Either can
+    be passed to split_payload when it is too big for one code.
+    """
+    if not compact:
+        return "\n".join(csv_rows)
+    packed = bytearray()
+    _write_varint(packed, len(csv_rows))
+    for csv_row in csv_rows:
+        _pack_row(csv_row, packed)
+    return _seal(BUNDLE_PREFIX, packed)
+
+def decode_bundle(payload):
+    """Decode a "SOB1:" bundle into its CSV_HEADER rows, raising ValueError if invalid"""
+    data = _unseal(BUNDLE_PREFIX, payload)
+    count, pos = _read_varint(data, 0)
+    rows = []
+    for _ in range(count):
+        row, pos = _unpack_row(data, pos)
+        rows.append(row)
+    if pos != len(data):
+        raise ValueError("Trailing bytes in bundle payload")
+    return rows
+
+def expand_payload(payload):
+    """Return the CSV rows carried by a whole payload.
+
+    Handles a plain CSV row, plain rows separated by newlines, a compact
+    "SOC1:" record and a "SOB1:" bundle. Plain text is only split into rows
+    when every line is a whole row, so a comment with a line break stays in
+    its row. Returns an empty list for a blank payload. Raises ValueError if
+    a compact payload is malformed.
+    """
+    if payload.startswith(COMPACT_PREFIX):
+        return [decode_compact(payload)]
+    if payload.startswith(BUNDLE_PREFIX):
+        return decode_bundle(payload)
+    if not payload.strip():
+        return []
+    if "\n" not in payload:
+        return [payload]
+    rows = [row.rstrip('\r') for row in payload.split('\n') if row.strip()]
+    # Free-text comments may hold commas, so a whole row has at least one per field
+    if len(rows) > 1 and all(row.count(',') >= len(SCAN_FIELDS) - 1 for row in rows):
+        return rows
+    return [payload.strip()]
+
+# Multi-part payloads: "SOP:<record id>:<part>/<total>:<chunk>", parts numbered from 1.
+# Only digits, capitals and ":/" in the header so it stays in QR alphanumeric mode.
+PART_PATTERN = re.compile(r"SOP:([0-9A-Z]{1,16}):(\d{1,3})/(\d{1,3}):(.*)\Z", re.DOTALL)
+MAX_PARTS = 64
+
+def split_payload(payload, chunk_size=200):
+    """Reference encoder: split a payload into multi-part QR texts.
+
+    Payloads that fit in one chunk are returned unchanged, so small records
+    keep using a single plain QR code.
+    """
+    if len(payload) <= chunk_size:
+        return [payload]
+    record_id = hashlib.sha1(payload.encode('utf-8')).hexdigest()[:8].upper()
+    chunks = [payload[i:i + chunk_size] for i in range(0, len(payload), chunk_size)]
+    if len(chunks) > MAX_PARTS:
+        raise ValueError(f"Payload needs {len(chunks)} parts, the limit is {MAX_PARTS}")
+    return [f"SOP:{record_id}:{index}/{len(chunks)}:{chunk}" for index, chunk in enumerate(chunks, 1)]
+
+class PartAssembler:
+    """Reassembles multi-part QR payloads shown one code at a time.
+
+    Parts may arrive in any order and any number of times. An incomplete
+    record is kept so the scout can re-show just the missing codes, and is
+    dropped after expire_seconds without a new part.
+    """
+
+    def __init__(self, expire_seconds=600, completed_history=500):
+        self.expire_seconds = expire_seconds
+        self.completed_history = completed_history
+        self.partial = {}     # record id -> {"total": n, "parts": {index: chunk}, "updated": time}
+        self.completed = {}   # record id -> None, insertion ordered, oldest evicted first
+
+    def add(self, qr_data):
+        """Feed one decoded QR text and return (status, payload, progress).
+
+        status is "single" for a plain payload (returned as payload), "part" for
+        a new part, "repeat" for a part already held or of a finished record,
+        and "complete" when the last part arrived (payload is the whole text).
+        progress is (record_id, received, total) for multi-part texts.
+        """
+        match = PART_PATTERN.match(qr_data)
+        if not match:
+            return "single", qr_data, None
+        record_id, index, total, chunk = match.group(1), int(match.group(2)), int(match.group(3)), match.group(4)
+        if not 1 <= index <= total <= MAX_PARTS:
+            return "single", qr_data, None
+        if record_id in self.completed:
+            return "repeat", None, (record_id, total, total)
+
+        now = time.monotonic()
+        self.expire(now)
+        record = self.partial.get(record_id)
+        if record is None or record["total"] != total:
+            # New record, or the tablet re-split it differently: start over
+            record = {"total": total, "parts": {}, "updated": now}
+            self.partial[record_id] = record
+        if index in record["parts"]:
+            return "repeat", None, (record_id, len(record["parts"]), total)
+
+        record["parts"][index] = chunk
+        record["updated"] = now
+        if len(record["parts"]) < total:
+            return "part", None, (record_id, len(record["parts"]), total)
+
+        del self.partial[record_id]
+        self.completed[record_id] = None
+        if len(self.completed) > self.completed_history:
+            del self.completed[next(iter(self.completed))]
+        payload = "".join(record["parts"][i] for i in range(1, total + 1))
+        return "complete", payload, (record_id, total, total)
+
+    def first_chunk(self, record_id):
+        """Return part 1 of an incomplete record, or None if it hasn't been seen"""
+        record = self.partial.get(record_id)
+        return record["parts"].get(1) if record else None
+
+    def missing_parts(self, record_id):
+        """Return the part numbers still missing from an incomplete record"""
+        record = self.partial.get(record_id)
+        if record is None:
+            return []
+        return [i for i in range(1, record["total"] + 1) if i not in record["parts"]]
+
+    def expire(self, now=None):
+        """Drop incomplete records that have not seen a part for expire_seconds"""
+        now = time.monotonic() if now is None else now
+        for record_id in [r for r, record in self.partial.items() if now - record["updated"] > self.expire_seconds]:
+            del self.partial[record_id]
+
+SCAN_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS scans (
+    id INTEGER PRIMARY KEY,
+    saved_at TEXT,
+    tablet TEXT,
+    digest TEXT NOT NULL UNIQUE,
+    data TEXT NOT NULL,
+    {", ".join(f"{field} TEXT" for field in SCAN_FIELDS)}
+);
+CREATE INDEX IF NOT EXISTS scans_match ON scans (matchKey);
+CREATE INDEX IF NOT EXISTS scans_team ON scans (teamNumber);
+CREATE INDEX IF NOT EXISTS scans_match_tablet ON scans (matchKey, allianceColor, station);
+"""
+
+SCAN_INSERT = (f"INSERT OR IGNORE INTO scans (saved_at, tablet, digest, data, {', '.join(SCAN_FIELDS)}) "
+               f"VALUES ({', '.join('?' * (len(SCAN_FIELDS) + 4))})")
+
+# synchronous pragma for each fsync policy, WAL mode only syncs at checkpoints below FULL
+SYNCHRONOUS_MODES = {"group": "FULL", "interval": "NORMAL", "none": "OFF"}
+
+def scan_digest(data):
+    """Return the dedupe key of a scanned CSV row"""
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+class ScanStore:
+    """SQLite store of saved scans in WAL mode, written by its own thread.
+
+    append() only queues the entry. The writer thread collects everything
+    queued within group_window into one transaction (group commit), so
+    scanning never waits on the disk, and runs submit()ted tasks such as
+    exports. append() never blocks; the backlog it returns is the caller's
+    backpressure signal. Before every write the writer keeps at most
+    queue_limit scans in memory and spills older ones to spill_path, so a
+    slow or failing disk can't grow the queue without bound; spilled scans
+    are imported again after the next successful commit.
+    Queries use a connection per calling thread and, with WAL, read
+    alongside the writer and other processes such as PyIntel. close()
+    commits everything still queued, spills what can't be committed, and
+    spilled scans are also imported on the next start.
+    """
+
+    def __init__(self, path=SCAN_DB, settings=store_settings):
+        self.path = path
+        self.spill_path = path + "-pending.jsonl"
+        self.settings = settings
+        self.error = None
+        self.backpressure_events = 0  # appends made while queue_limit scans were already waiting
+        self._spilled = False
+        self._local = threading.local()
+        self._cond = threading.Condition()
+        self._pending = []
+        self._tasks = []
+        self._running = False
+        self._thread = None
+        connection = self.reader()
+        connection.executescript(SCAN_SCHEMA)
+        connection.commit()
+        if os.path.exists(self.spill_path):
+            # Scans that could not be committed before the last shutdown
+            entries = list(journal_entries(self.spill_path))
+            self._insert(connection, entries)
+            os.remove(self.spill_path)
+            log.warning("Recovered %d scans from %s", len(entries), self.spill_path)
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=10)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(f"PRAGMA synchronous={SYNCHRONOUS_MODES[self.settings['fsync_policy']]}")
+        return connection
+
+    def reader(self):
+        """Return the calling thread's connection"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+        return connection
+
+    @staticmethod
+    def _insert(connection, entries):
+        rows = []
+        for entry in entries:
+            record = entry["record"]
+            rows.append((entry["saved_at"], entry["tablet"], entry["digest"], format_record(record), *record))
+        with connection:
+            connection.executemany(SCAN_INSERT, rows)
+
+    def start(self):
+        """Start the writer thread"""
+        if self._thread is not None:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._writer, name="scan-store", daemon=True)
+        self._thread.start()
+
+    def append(self, entry):
+        """Queue one entry for the writer thread and return how many are waiting.
+
+        Never waits, it is called from the GUI thread. A backlog above
+        queue_limit means the writer is failing or falling behind.
+        """
+        with self._cond:
+            if len(self._pending) >= self.settings["queue_limit"]:
+                self.backpressure_events += 1
+            self._pending.append(entry)
+            self._cond.notify_all()
+            return len(self._pending)
+
+    def backlog(self):
+        """Return the number of scans waiting for the writer"""
+        with self._cond:
+            return len(self._pending)
+
+    def submit(self, task):
+        """Run task() on the writer thread after the scans queued so far are committed"""
+        with self._cond:
+            self._tasks.append(task)
+            self._cond.notify_all()
+
+    def import_entries(self, entries):
+        """Insert entries right away on the calling thread, used to migrate older files"""
+        self._insert(self.reader(), entries)
+
+    def close(self):
+        """Commit what is still queued and stop the writer thread"""
+        thread = self._thread
+        if thread is None:
+            return
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        thread.join()
+        self._thread = None
+
+    def _writer(self):
+        connection = None
+        last_sync = time.monotonic()
+        while True:
+            with self._cond:
+                while self._running and not self._pending and not self._tasks:
+                    self._cond.wait()
+                if not self._pending and not self._tasks:
+                    break
+            # Give scans arriving together a moment to join this transaction
+            if self._pending and self._running and self.settings["group_window"] > 0:
+                time.sleep(self.settings["group_window"])
+            overflow = []
+            with self._cond:
+                # Keep the newest scans for this write, spill the rest so memory stays bounded
+                excess = len(self._pending) - self.settings["queue_limit"]
+                if excess > 0:
+                    overflow, self._pending = self._pending[:excess], self._pending[excess:]
+                batch, self._pending = self._pending, []
+                tasks, self._tasks = self._tasks, []
+                self._cond.notify_all()
+            if overflow:
+                self._spill(overflow)
+                self._spilled = True
+
+            if batch:
+                try:
+                    if connection is None:
+                        connection = self._connect()
+                    start = time.perf_counter()
+                    self._insert(connection, batch)
+                    pipeline_metrics.record("persist", time.perf_counter() - start)
+                    now = time.monotonic()
+                    if self.settings["fsync_policy"] == "interval" and now - last_sync >= self.settings["fsync_interval"]:
+                        connection.execute("PRAGMA wal_checkpoint(PASSIVE)")
+                        last_sync = now
+                    self.error = None
+                    if self._spilled:
+                        self._import_spill(connection)
+                except sqlite3.Error as e:
+                    self.error = e
+                    log.error("Error writing scan store: %s", e)
+                    with self._cond:
+                        retry = self._running
+                        if retry:
+                            # Retried with the next write, the excess is spilled then
+                            self._pending[:0] = batch
+                            self._tasks[:0] = tasks
+                    if retry:
+                        with self._cond:
+                            self._cond.wait(1.0)
+                        continue
+                    self._spill(batch)
+
+            for task in tasks:
+                try:
+                    task()
+                except Exception as e:
+                    log.exception("Error in scan store task: %s", e)
+
+        if connection is not None:
+            connection.close()
+
+    def _import_spill(self, connection):
+        """Commit scans spilled while the database was failing, on the writer thread"""
+        try:
+            entries = list(journal_entries(self.spill_path))
+            self._insert(connection, entries)
+            os.remove(self.spill_path)
+            self._spilled = False
+            log.warning("Recovered %d spilled scans from %s", len(entries), self.spill_path)
+        except (OSError, sqlite3.Error) as e:
+            log.error("Error recovering spilled scans from %s: %s", self.spill_path, e)
+
+    def _spill(self, entries):
+        """Save scans the store could not take for a later commit or the next start to import"""
+        try:
+            with open(self.spill_path, 'a', encoding='utf-8') as f:
+                for entry in entries:
+                    f.write(json.dumps({"saved_at": entry["saved_at"], "tablet": entry["tablet"],
+                                        "digest": entry["digest"], "data": format_record(entry["record"])},
+                                       ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            log.warning("Saved %d uncommitted scans to %s", len(entries), self.spill_path)
+        except OSError as e:
+            log.error("Lost %d scans, could not write %s: %s", len(entries), self.spill_path, e)
+
+    def recent_digests(self, limit):
+        """Return the digests of the most recently stored rows, oldest first"""
+        query = "SELECT digest FROM scans ORDER BY id DESC LIMIT ?"
+        return [digest for digest, in self.reader().execute(query, (limit,))][::-1]
+
+    def contains(self, digest):
+        """Check whether a row with this scan_digest is stored"""
+        query = "SELECT 1 FROM scans WHERE digest = ?"
+        return self.reader().execute(query, (digest,)).fetchone() is not None
+
+    def match_tablets(self):
+        """Yield (match_key, tablet_id) for every match and tablet with a stored scan"""
+        query = "SELECT DISTINCT matchKey, allianceColor, station FROM scans WHERE matchKey IS NOT NULL ORDER BY matchKey"
+        for match_key, color, station in self.reader().execute(query):
+            yield match_key, f"{color} {station}"
+
+    def count_incomplete(self):
+        """Count stored rows that are missing one or more fields"""
+        query = f"SELECT COUNT(*) FROM scans WHERE {' OR '.join(f'{field} IS NULL' for field in SCAN_FIELDS)}"
+        return self.reader().execute(query).fetchone()[0]
+
+    def export_csv(self, results_csv):
+        """Write every stored row to a CSV file, missing fields as "null", and return the number of rows"""
+        count = 0
+        temp_path = results_csv + ".tmp"
+        with open(temp_path, 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(SCAN_FIELDS)
+            for row in self.reader().execute(f"SELECT {', '.join(SCAN_FIELDS)} FROM scans ORDER BY id"):
+                writer.writerow(["null" if value is None else value for value in row])
+                count += 1
+        os.replace(temp_path, results_csv)
+        return count
+
+    def export_scan_files(self, save_dir):
+        """Write the per-scan qr_data_*.csv files for stored rows that don't have one yet"""
+        count = 0
+        query = "SELECT saved_at, tablet, matchKey, data FROM scans WHERE saved_at IS NOT NULL ORDER BY id"
+        for saved_at, tablet_id, match_key, data in self.reader().execute(query):
+            timestamp = datetime.datetime.fromisoformat(saved_at).strftime("%Y%m%d_%H%M%S")
+            tablet_suffix = f"_{tablet_id.replace(' ', '')}" if tablet_id else ""
+            match_suffix = f"_{match_key}" if match_key else ""
+            filepath = os.path.join(save_dir, f"qr_data{match_suffix}{tablet_suffix}_{timestamp}.csv")
+            if os.path.exists(filepath):
+                continue
+            with open(filepath, 'w') as f:
+                f.write(data)
+            count += 1
+        return count
+
+class MatchTracker:
+    """Which tablets have been scanned for every match seen, not just the current one.
+
+    Matches are tracked independently, so scans from interleaved matches can
+    be taken in any order. Marking a scan and looking up a match are dict and
+    set operations; incomplete matches are kept in their own ordered dict so
+    outstanding() only walks what is still missing.
+    """
+
+    def __init__(self, tablet_ids=TABLET_IDS):
+        self.tablet_ids = tablet_ids
+        self.matches = {}     # match key -> set of scanned tablet ids
+        self.incomplete = {}  # match key -> None, for matches missing a tablet, oldest first
+
+    def mark(self, match_key, tablet_id):
+        """Record a scan of tablet_id for match_key"""
+        scanned = self.matches.get(match_key)
+        if scanned is None:
+            scanned = self.matches[match_key] = set()
+            self.incomplete[match_key] = None
+        if tablet_id in self.tablet_ids:
+            scanned.add(tablet_id)
+            if len(scanned) == len(self.tablet_ids):
+                self.incomplete.pop(match_key, None)
+
+    def scanned(self, match_key):
+        """Return the tablet ids scanned for match_key"""
+        return self.matches.get(match_key, set())
+
+    def missing(self, match_key):
+        """Return the tablet ids not yet scanned for match_key"""
+        scanned = self.scanned(match_key)
+        return [tablet_id for tablet_id in self.tablet_ids if tablet_id not in scanned]
+
+    def outstanding(self):
+        """Return {match_key: missing tablet ids} for every incomplete match, oldest first"""
+        return {match_key: self.missing(match_key) for match_key in self.incomplete}
+
+class DedupeIndex:
+    """Bounded in-memory index of scan digests with LRU and optional age eviction.
+
+    Digests beyond capacity (least recently seen first) or not seen for
+    max_age seconds are forgotten. Misses are passed to lookup(digest), the
+    scan store, so evicted scans and scans from before a restart still count
+    as duplicates; a hit there is cached again.
+    """
+
+    def __init__(self, capacity=5000, max_age=0, lookup=None):
+        self.capacity = capacity
+        self.max_age = max_age
+        self.lookup = lookup
+        self.entries = {}  # digest -> time last seen, least recently seen first
+
+    def __len__(self):
+        return len(self.entries)
+
+    def seen(self, digest):
+        """Check whether digest was scanned before, refreshing its place if so"""
+        now = time.monotonic()
+        last_seen = self.entries.pop(digest, None)
+        if last_seen is not None and not (self.max_age and now - last_seen > self.max_age):
+            self.entries[digest] = now
+            return True
+        if self.lookup is not None and self.lookup(digest):
+            self.add(digest, now)
+            return True
+        return False
+
+    def add(self, digest, now=None):
+        """Remember a digest, evicting the least recently seen ones beyond capacity"""
+        self.entries.pop(digest, None)
+        self.entries[digest] = time.monotonic() if now is None else now
+        while len(self.entries) > self.capacity:
+            del self.entries[next(iter(self.entries))]
+
+    def trim(self):
+        """Drop digests older than max_age"""
+        if not self.max_age:
+            return
+        cutoff = time.monotonic() - self.max_age
+        while self.entries:
+            digest = next(iter(self.entries))
+            if self.entries[digest] >= cutoff:
+                break
+            del self.entries[digest]
+
+    def shrink(self, size):
+        """Forget the least recently seen digests beyond size, the store still catches them"""
+        while len(self.entries) > size:
+            del self.entries[next(iter(self.entries))]
+
+    def clear(self):
+        self.entries.clear()
+
+def journal_entries(path):
+    """Yield store entries from a JSON-lines scan journal, skipping a torn last line"""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            yield {"saved_at": entry["saved_at"], "tablet": entry["tablet"],
+                   "digest": entry.get("digest") or scan_digest(entry["data"]),
+                   "record": parse_record(entry["data"])}
+
+def legacy_entries(journal_path=JOURNAL_PATH, results_csv=RESULTS_CSV):
+    """Yield store entries from the scan journal, or results.csv if there is no journal"""
+    if os.path.exists(journal_path):
+        yield from journal_entries(journal_path)
+    elif os.path.exists(results_csv):
+        with open(results_csv, newline='') as csvfile:
+            reader = csv.reader(csvfile)
+            next(reader, None)  # Skip the header
+            for row in reader:
+                if row:
+                    data = ','.join(row)
+                    yield {"saved_at": None, "tablet": None, "digest": scan_digest(data),
+                           "record": parse_record(data)}
+
+# What scan_events() made of one decoded text: records are the (status, tablet_id) pairs from
+# ingest() and saved the tablet ids of the new records
+ScanEvent = namedtuple("ScanEvent", "kind message records saved")
+
+class ScanSession:
+    """Dedupe, tablet tracking and persistence for decoded QR payloads.
+
+    Holds no Qt objects, so the GUI and the offline replay harness run scans
+    through the same code. Status messages go to notify(message, message_type),
+    which may be called from the store writer thread; the GUI routes it to
+    add_status_message through a signal.
+    """
+
+    def __init__(self, save_dir=SAVE_DIR, results_csv=RESULTS_CSV, notify=None, store_path=SCAN_DB,
+                 journal_path=JOURNAL_PATH):
+        self.save_dir = save_dir
+        self.results_csv = results_csv
+        self.notify = notify or (lambda message, message_type="info": None)
+        new_store = not os.path.exists(store_path)
+        self.store = ScanStore(store_path)
+        if new_store:
+            # Carry over scans saved before the store existed
+            entries = list(legacy_entries(journal_path, results_csv))
+            if entries:
+                self.store.import_entries(entries)
+                log.info("Imported %d earlier scans into %s", len(entries), store_path)
+        self.store.start()
+        # Seeded from the store so rescans right after a restart are caught in memory
+        self.dedupe = DedupeIndex(store_settings["dedupe_capacity"], store_settings["dedupe_max_age"],
+                                  lookup=self.store.contains)
+        for digest in self.store.recent_digests(store_settings["dedupe_capacity"]):
+            self.dedupe.add(digest)
+        # Matches from earlier runs stay open until all their tablets are in
+        self.tracker = MatchTracker()
+        for match_key, tablet_id in self.store.match_tablets():
+            self.tracker.mark(match_key, tablet_id)
+        self.last_match_key = None
+        self.assembler = PartAssembler()
+        self.part_progress = {}    # record id -> (tablet_id, received, total) for incomplete records
+        self.last_progress = None  # (received, total, missing part numbers) of the part handled by the last ingest
+        self.last_rejected = None
+        self.last_backlog_warning = 0.0
+        self.csv_timer = None  # Pending results.csv refresh, PyIntel reads the file while scanning goes on
+        self.csv_lock = threading.Lock()
+
+    def ingest(self, qr_data):
+        """Run one decoded QR text through part assembly, dedupe, tablet tracking and saving.
+
+        Returns a list with one (status, tablet_id) per record the text carried,
+        where status is "saved", "duplicate", "invalid" or "error". A text that
+        is not a whole payload gives a single entry instead: "partial" when a
+        new part of a multi-part payload was stored (see last_progress),
+        "repeat_part" for a part already held, or "error" if it can't be read.
+        The list is never empty.
+        """
+        start = time.perf_counter()
+        try:
+            return self._ingest(qr_data)
+        finally:
+            pipeline_metrics.record("parse", time.perf_counter() - start)
+
+    def _ingest(self, qr_data):
+        status, payload, progress = self.assembler.add(qr_data)
+        self.prune_part_progress()
+        if status == "repeat":
+            return [("repeat_part", None)]
+        if status == "part":
+            record_id, received, total = progress
+            # Part 1 starts with the CSV fields that name the tablet
+            first_chunk = self.assembler.first_chunk(record_id)
+            tablet_id = self.identify_tablet(parse_record(first_chunk)) if first_chunk else None
+            self.part_progress[record_id] = (tablet_id, received, total)
+            self.last_progress = (received, total, self.assembler.missing_parts(record_id))
+            return [("partial", tablet_id)]
+        if status == "complete":
+            qr_data = payload
+
+        # Compact payloads are expanded to CSV rows, so both formats dedupe against each other
+        try:
+            rows = expand_payload(qr_data)
+        except (ValueError, UnicodeDecodeError) as e:
+            # Report a bad code once, not on every frame it stays in view
+            if qr_data != self.last_rejected:
+                self.last_rejected = qr_data
+                self.notify(f"Unreadable compact QR payload: {e}", "error")
+            return [("error", None)]
+        if not rows:
+            if qr_data != self.last_rejected:
+                self.last_rejected = qr_data
+                self.notify("Empty QR payload", "error")
+            return [("error", None)]
+
+        # Rows from a bundle are checked one by one so a bad row can't hide the others
+        validate = len(rows) > 1
+        return [self.ingest_row(row, validate) for row in rows]
+
+    def scan_events(self, codes):
+        """Ingest the decoded texts of one frame and yield a ScanEvent for each.
+
+        kind is "saved" if any record was new, else "partial", "duplicate",
+        "repeat_part" or "rejected" (errors and invalid rows, already
+        reported through notify). message is the status line to show, or
+        None when there is nothing to tell the user.
+        """
+        for qr_data in codes:
+            records = self.ingest(qr_data)
+            status, tablet_id = records[0]
+            saved = [tablet_id for status, tablet_id in records if status == "saved"]
+            duplicates = sum(1 for status, _ in records if status == "duplicate")
+            if status == "repeat_part":
+                # A part that is still on screen
+                yield ScanEvent("repeat_part", None, records, saved)
+            elif status == "partial":
+                received, total, missing = self.last_progress
+                yield ScanEvent("partial", f"Received part {received}/{total} from {tablet_id or 'Unknown'}, "
+                                           f"{self.describe_missing(missing)}", records, saved)
+            elif saved and len(records) == 1:
+                yield ScanEvent("saved", f"Scanned data from {saved[0] or 'Unknown'}", records, saved)
+            elif saved:
+                tablets = ", ".join(sorted({tablet_id or "Unknown" for tablet_id in saved}))
+                yield ScanEvent("saved", f"Scanned bundle from {tablets}: {len(saved)} new, "
+                                         f"{duplicates} already scanned", records, saved)
+            elif duplicates:
+                yield ScanEvent("duplicate", f"QR code already scanned: {qr_data[:30]}...", records, saved)
+            else:
+                yield ScanEvent("rejected", None, records, saved)
+
+    def ingest_row(self, qr_data, validate=False):
+        """Dedupe, track and save one CSV row, returning (status, tablet_id)"""
+        # Parse once, every helper below works on the record
+        record = self.sanitize_csv_data(parse_record(qr_data.strip('"\'')))
+
+        # The digest is of the row as stored, so rows imported from results.csv or the journal,
+        # whose comments already had their commas replaced, match a rescan of the same tablet
+        digest = scan_digest(format_record(record))
+        # Recent scans are in memory, older ones are an indexed lookup in the store
+        if self.dedupe.seen(digest):
+            return "duplicate", None
+
+        # Add to scanned history
+        self.dedupe.add(digest)
+
+        if validate and not self.validate_qr_data(record):
+            self.notify(f"Skipped invalid row: {qr_data[:30]}...", "warning")
+            return "invalid", None
+
+        # Identify the tablet, save_qr_data updates its match
+        tablet_id = self.identify_tablet(record)
+
+        # Save the QR data
+        entry = self.save_qr_data(record, tablet_id, digest)
+        return ("saved" if entry else "error"), tablet_id
+
+    def identify_tablet(self, record):
+        """Identify which tablet the data came from based on CSV values"""
+        alliance_color = record.allianceColor  # allianceColor (Red/Blue)
+        station = record.station               # station (1,2,3)
+        if alliance_color and station:
+            return f"{alliance_color} {station}"
+        return None
+    
+    def get_match_key(self, record):
+        """Extract match key from CSV data"""
+        return record.matchKey or None
+    
+    def sanitize_csv_data(self, record):
+        """Sanitize CSV data to handle commas in string fields."""
+        # Replace commas in the endgame_Comments field with a pipe (|)
+        if record.endgame_Comments and ',' in record.endgame_Comments:
+            return record._replace(endgame_Comments=record.endgame_Comments.replace(',', '|'))
+        return record
+
+    def save_qr_data(self, record, tablet_id=None, digest=None):
+        """Queue the QR code data for the scan store and update tracking."""
+        # Sanitize the data to handle commas in string fields
+        record = self.sanitize_csv_data(record)
+        digest = digest or scan_digest(format_record(record))
+        
+        # Extract match key to track matches
+        match_key = self.get_match_key(record)
+        
+        # Mark this tablet as scanned for its own match, other open matches keep their progress
+        if match_key:
+            self.last_match_key = match_key
+            self.tracker.mark(match_key, tablet_id)
+        
+        # The writer thread commits the entry, results.csv and the per-scan files are exported from the store
+        entry = {
+            "saved_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "tablet": tablet_id,
+            "digest": digest,
+            "record": record,
+        }
+        backlog = self.store.append(entry)
+        if (self.store.error or backlog > store_settings["queue_limit"] // 2) and \
+                time.monotonic() - self.last_backlog_warning > 10:
+            # The disk is not keeping up, scans are held in memory until it does
+            self.last_backlog_warning = time.monotonic()
+            if self.store.error:
+                self.notify(f"Scan store can't be written, {backlog} scans waiting: {self.store.error}", "error")
+            else:
+                self.notify(f"Saving is falling behind: {backlog} scans waiting to be written, "
+                            f"{self.store.backpressure_events} over the queue limit so far", "warning")
+        self.schedule_csv_export()
+        
+        return entry
+    
+    def export_csv(self, scan_files=False):
+        """Export results.csv, and optionally the per-scan files, from the scan store.
+
+        Runs on the store writer thread once the scans queued so far are committed.
+        """
+        def export():
+            count = self.write_results_csv()
+            if count is None:
+                return
+            message = f"Exported {count} rows to {os.path.basename(self.results_csv)}"
+            if scan_files:
+                try:
+                    written = self.store.export_scan_files(self.save_dir)
+                except (OSError, sqlite3.Error) as e:
+                    self.report_error(f"Error exporting scan files: {e}")
+                    return
+                message += f" and {written} new scan files"
+            log.info(message)
+            self.notify(message, "success")
+
+        self.store.submit(export)
+    
+    def schedule_csv_export(self):
+        """Refresh results.csv csv_export_interval seconds from now unless a refresh is already pending.
+
+        Saves in the meantime are picked up by the same refresh, so the file
+        lags the store by at most the interval without being rewritten per scan.
+        """
+        interval = store_settings["csv_export_interval"]
+        if interval <= 0:
+            return
+        with self.csv_lock:
+            if self.csv_timer is not None:
+                return
+            self.csv_timer = threading.Timer(interval, self.store.submit, (self.refresh_csv,))
+            self.csv_timer.daemon = True
+            self.csv_timer.start()
+
+    def refresh_csv(self):
+        """Rewrite results.csv on the store writer thread, quietly unless it fails"""
+        with self.csv_lock:
+            self.csv_timer = None
+        self.write_results_csv()
+
+    def write_results_csv(self):
+        """Export results.csv from the store and return the row count, or report the error and return None"""
+        try:
+            return self.store.export_csv(self.results_csv)
+        except (OSError, sqlite3.Error) as e:
+            self.report_error(f"Error exporting results CSV: {e}")
+            return None
+
+    def report_error(self, message):
+        """Log an error and pass it on to notify"""
+        log.error(message)
+        self.notify(message, "error")
+
+    def describe_missing(self, missing):
+        """Return "show part 1, 3 next" for a list of missing part numbers, cut short for long lists"""
+        shown = ", ".join(str(index) for index in missing[:8])
+        more = f" (+{len(missing) - 8} more)" if len(missing) > 8 else ""
+        return f"show part {shown}{more} next"
+
+    def release_memory(self):
+        """Drop in-memory caches the scan store backs, registered with MemoryBudget"""
+        self.dedupe.trim()
+        self.dedupe.shrink(len(self.dedupe) // 2)
+        self.assembler.expire()
+        self.prune_part_progress()
+
+    def prune_part_progress(self):
+        """Forget the progress of records the assembler finished or expired"""
+        if any(record_id not in self.assembler.partial for record_id in self.part_progress):
+            self.part_progress = {record_id: progress for record_id, progress in self.part_progress.items()
+                                  if record_id in self.assembler.partial}
+
+    def missing_tablets(self, match_key):
+        """Return the tablets with no scan for match_key"""
+        return self.tracker.missing(match_key)
+    
+    def close(self):
+        """Commit queued scans, stop the store writer and bring results.csv up to date"""
+        with self.csv_lock:
+            if self.csv_timer is not None:
+                self.csv_timer.cancel()
+                self.csv_timer = None
+        self.store.close()
+        self.write_results_csv()
+    
+    def create_match_summary_file(self):
+        """Create a summary file for all tablets in a match"""
+        if not self.last_match_key:
+            return
+        
+        # Check if we have at least some data
+        missing = self.missing_tablets(self.last_match_key)
+        if len(missing) == len(TABLET_IDS):
+            return
+        
+        # Create a summary of which tablets were scanned
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"match_summary_{self.last_match_key}_{timestamp}.txt"
+        filepath = os.path.join(self.save_dir, filename)
+        
+        with open(filepath, 'w') as f:
+            f.write(f"Match Summary for {self.last_match_key}\n")
+            f.write("=" * 40 + "\n")
+            
+            for tablet in TABLET_IDS:
+                status = "✗ MISSING" if tablet in missing else "✓ SCANNED"
+                f.write(f"{tablet}: {status}\n")
+
+            # Every other match still waiting on a tablet
+            outstanding = {key: tablets for key, tablets in self.tracker.outstanding().items()
+                           if key != self.last_match_key}
+            if outstanding:
+                f.write("\nOutstanding Matches\n")
+                f.write("=" * 40 + "\n")
+                for match_key, tablets in outstanding.items():
+                    f.write(f"{match_key}: {', '.join(tablets)}\n")
+        
+        log.info("Match summary saved to %s", filepath)
+        self.notify(f"Match summary saved", "success")
+    
+    def validate_qr_data(self, record):
+        """Validate the QR code data format"""
+        # Ensure the data has the correct number of fields, short rows are padded with None
+        if record[-1] is None:
+            return False
+        # Perform additional validation checks if necessary
+        # Example: Check if teamNumber is numeric
+        return record.teamNumber.isdigit()
+    
+    def check_csv_data(self):
+        """Check the stored scans for missing fields and export them to the CSV file."""
+        def check():
+            try:
+                incomplete = self.store.count_incomplete()
+            except sqlite3.Error as e:
+                self.report_error(f"Error checking CSV data: {e}")
+                return
+            if incomplete:
+                self.notify(f"{incomplete} rows are missing fields. Filling with null...", "warning")
+
+            # The export writes every header and fills missing values
+            if self.write_results_csv() is not None:
+                self.notify("CSV data checked and fixed successfully.", "success")
+
+        # Runs on the store writer thread, after the scans queued so far
+        self.store.submit(check)
+
+def add_pipeline_arguments(parser):
+    """Add the decoder pipeline options shared by the scanner window, service and replay to an ArgumentParser"""
+    parser.add_argument("--workers", type=int, default=DECODE_WORKERS, help="Decoder threads")
+    parser.add_argument("--no-focus", action="store_true", help="Always decode the full frame")
+    parser.add_argument("--no-motion-gate", action="store_true", help="Decode every frame even if nothing moves")
+    parser.add_argument("--no-quality-gate", action="store_true", help="Decode blurred and glared frames too")
+    parser.add_argument("--no-fallback", action="store_true",
+                        help="Don't retry missed regions with stronger preprocessing")
+    parser.add_argument("--decoder", choices=("auto",) + tuple(DECODER_BACKENDS),
+                        default=qr_detection_settings["decoder_backend"],
+                        help="QR decoder backend, auto benchmarks the available ones first")
+
+def settings_from_args(args):
+    """Apply the options from add_pipeline_arguments to qr_detection_settings"""
+    qr_detection_settings["focus_enabled"] = not args.no_focus
+    qr_detection_settings["motion_gate_enabled"] = not args.no_motion_gate
+    qr_detection_settings["quality_gate_enabled"] = not args.no_quality_gate
+    qr_detection_settings["fallback_enabled"] = not args.no_fallback
+    qr_detection_settings["decoder_backend"] = args.decoder
+
+def open_camera(camera_index):
+    """Open a camera with the capture backend that suits this platform"""
+    if platform.system() == "Windows":
+        return cv2.VideoCapture(camera_index, cv2.CAP_DSHOW)
+    return cv2.VideoCapture(camera_index)
+
+class CameraCapture:
+    """Capture loop that reads a camera into a FrameRing and feeds the decoder pool.
+
+    run() blocks until stop() is called, so it can be driven by a QThread in
+    the GUI or a plain thread in the headless service. on_frame(camera_index,
+    seq) is called after every published frame, and on_activity(camera_index,
+    active) when the motion gate switches between an active and idle scene.
+    """
+
+    def __init__(self, camera_index=0, decoder_pool=None, on_frame=None, on_activity=None):
+        self.camera_index = camera_index
+        self.decoder_pool = decoder_pool
+        self.on_frame = on_frame
+        self.running = False
+        self.capture = None
+        self.ring = None
+        self.capture_rate = RateMeter()
+        self.motion_gate = MotionGate(on_change=None if on_activity is None
+                                      else lambda active: on_activity(camera_index, active))
+
+    def run(self):
+        self.capture = open_camera(self.camera_index)
+        self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, 640)  # Lower resolution for faster processing
+        self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+        self.capture.set(cv2.CAP_PROP_FPS, 30)  # Higher FPS for smoother video
+        self.running = True
+
+        # Size the ring from the first frame, the camera may ignore the requested resolution
+        ret, frame = self.capture.read()
+        if ret:
+            self.ring = FrameRing(frame.shape)
+        else:
+            log.error("Error reading from camera %s", self.camera_index)
+            self.running = False
+
+        while self.running:
+            index = self.ring.acquire_write()
+            if index is None:
+                # Every slot is pinned by a reader, drop this frame without decoding it
+                ret = self.capture.grab()
+            else:
+                slot = self.ring.frames[index]
+                start = time.perf_counter()
+                ret, frame = self.capture.read(slot)
+                pipeline_metrics.record("capture", time.perf_counter() - start)
+                if ret and frame is not slot:
+                    # Resolution changed mid-stream, copy into the slot to keep the ring consistent
+                    if frame.shape != slot.shape:
+                        log.warning("Camera %s changed resolution to %s", self.camera_index, frame.shape)
+                        break
+                    slot[...] = frame
+            if ret:
+                self.capture_rate.tick()
+                if index is not None:
+                    seq = self.ring.publish(index)
+                    if self.decoder_pool is not None and self.motion_gate.should_decode(self.ring.frames[index],
+                                                                                        self.ring.captured_at[index]):
+                        self.decoder_pool.submit(self.camera_index, self.ring)
+                    if self.on_frame is not None:
+                        self.on_frame(self.camera_index, seq)
+            else:
+                log.error("Error reading from camera %s", self.camera_index)
+                break
+
+        self.capture.release()
+        self.capture = None
+
+    def stop(self):
+        self.running = False
+
+def probe_camera(camera_index):
+    """Return True if the camera opens and delivers a frame"""
+    cap = open_camera(camera_index)
+    try:
+        if not cap.isOpened():
+            return False
+        ret, _ = cap.read()
+        return ret
+    finally:
+        cap.release()
+
+def discover_cameras(max_index=5, timeout=5.0, known_good=()):
+    """Probe camera indices in parallel and return [{"index": i, "name": ..., "probed": bool}, ...].
+
+    Indices in known_good, such as cameras that are already capturing, are
+    reported without being reopened and with probed False, so they are not
+    cached on their own say-so. An index that hangs is given up on after
+    timeout seconds.
+    """
+    results = {index: True for index in known_good}
+    lock = threading.Lock()
+
+    def probe(index):
+        ok = probe_camera(index)
+        with lock:
+            results[index] = ok
+
+    threads = []
+    for index in range(max_index):
+        if index in results:
+            continue
+        thread = threading.Thread(target=probe, args=(index,), name=f"camera-probe-{index}", daemon=True)
+        thread.start()
+        threads.append(thread)
+
+    deadline = time.monotonic() + timeout
+    for thread in threads:
+        thread.join(max(0.0, deadline - time.monotonic()))
+
+    with lock:
+        found = sorted(index for index, ok in results.items() if ok)
+    available_cameras = [{"index": index, "name": f"Camera {index+1}", "probed": index not in known_good}
+                         for index in found]
+    if not available_cameras:
+        log.warning("No cameras found")
+        available_cameras.append({"index": 0, "name": "Default Camera", "probed": False})
+
+    log.info("Found %d cameras: %s", len(available_cameras), [cam['name'] for cam in available_cameras])
+    return available_cameras
+
+def load_camera_cache():
+    """Return the cached {"cameras": [...], "last_camera": index}, or None if there is none"""
+    try:
+        with open(CAMERA_CACHE, 'r') as f:
+            cache = json.load(f)
+        if cache.get("cameras"):
+            return cache
+    except (OSError, ValueError, AttributeError):
+        pass
+    return None
+
+def save_camera_cache(cameras, last_camera=None):
+    """Remember the probed cameras and the camera that was last used"""
+    cameras = [camera for camera in cameras if camera.get("probed", True)]
+    try:
+        with open(CAMERA_CACHE, 'w') as f:
+            json.dump({"cameras": cameras, "last_camera": last_camera}, f)
+    except OSError as e:
+        log.warning("Error saving camera cache: %s", e)
@@ -0,0 +1,217 @@
+"""Offline replay and benchmark harness for the Scout Ops QR scanner.
+
+Feeds recorded video files, image files or folders of images through the
+same frame ring, motion gate, decoder pool and ScanSession as the live
+scanner, with no camera and no Qt window, then reports throughput, decode
+latency, decode success rate and scan-to-row latency.
+
+    python scanner_replay.py recordings/qm12.mp4 frames/ --fps 30 --json report.json
+"""
+import argparse
+import json
+import os
+import queue
+import tempfile
+import threading
+import time
+
+import cv2
+
+from scanner_core import (DECODE_WORKERS, DecodeWorkerPool, FrameRing, MotionGate, ScanSession,
+                          add_pipeline_arguments, pipeline_metrics, settings_from_args)
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+# Frame rate the frame times of an --fps 0 run assume, so time-based gates behave the same on every run
+REPLAY_FRAME_RATE = 30.0
+
+
+class TimedDecodeWorkerPool(DecodeWorkerPool):
+    """DecodeWorkerPool that records how long every decode takes"""
+
+    def __init__(self, on_result, workers=DECODE_WORKERS, backend=None):
+        super().__init__(on_result, workers, backend)
+        self.decode_latencies = []
+        self.frames_with_codes = 0
+        self._stats_lock = threading.Lock()
+
+    def decode_frame(self, frame, camera, seq, captured_at=None):
+        start = time.perf_counter()
+        codes = super().decode_frame(frame, camera, seq, captured_at)
+        with self._stats_lock:
+            self.decode_latencies.append(time.perf_counter() - start)
+            if codes:
+                self.frames_with_codes += 1
+        return codes
+
+
+def iter_frames(paths):
+    """Yield BGR frames from video files, image files and directories of images"""
+    for path in paths:
+        if os.path.isdir(path):
+            names = sorted(name for name in os.listdir(path) if name.lower().endswith(IMAGE_EXTENSIONS))
+            image_paths = [os.path.join(path, name) for name in names]
+        elif path.lower().endswith(IMAGE_EXTENSIONS):
+            image_paths = [path]
+        else:
+            capture = cv2.VideoCapture(path)
+            if not capture.isOpened():
+                print(f"Could not open {path}")
+            while capture.isOpened():
+                ret, frame = capture.read()
+                if not ret:
+                    break
+                yield frame
+            capture.release()
+            continue
+
+        for image_path in image_paths:
+            frame = cv2.imread(image_path)
+            if frame is None:
+                print(f"Could not read {image_path}")
+                continue
+            yield frame
+
+
+def percentiles(values, points=(50, 90, 99)):
+    """Return {"p50": ms, ...} for a list of durations in seconds"""
+    if not values:
+        return {f"p{point}": None for point in points}
+    ordered = sorted(values)
+    result = {}
+    for point in points:
+        index = min(len(ordered) - 1, int(round(point / 100 * (len(ordered) - 1))))
+        result[f"p{point}"] = round(ordered[index] * 1000, 2)
+    result["max"] = round(ordered[-1] * 1000, 2)
+    return result
+
+
+def replay(paths, output_dir, fps=0.0, workers=DECODE_WORKERS, backend=None):
+    """Run every frame in paths through the scanner pipeline and return a report dict.
+
+    With fps=0 each frame waits until a decoder has taken the previous one, so
+    nothing is dropped and runs are repeatable. With fps>0 frames are fed at
+    that rate like a live camera and the decoder drops stale frames.
+    """
+    results = queue.Queue()
+    pool = TimedDecodeWorkerPool(results.put, workers, backend)
+    pool.resolve_backend()  # Benchmark before the clock starts
+    session = ScanSession(save_dir=output_dir, results_csv=os.path.join(output_dir, "results.csv"),
+                          store_path=os.path.join(output_dir, "scans.db"))
+    motion_gate = MotionGate()
+    counts = {"saved": 0, "duplicate": 0, "invalid": 0, "error": 0, "partial": 0, "repeat_part": 0}
+    scan_to_row = []
+
+    def ingest_results(block=False):
+        while True:
+            try:
+                result = results.get(block=block, timeout=0.5)
+            except queue.Empty:
+                return
+            for event in session.scan_events(result["codes"]):
+                for status, _ in event.records:
+                    counts[status] += 1
+                    if status == "saved":
+                        # Runs on the writer thread once the row is committed
+                        session.store.submit(lambda decoded_at=result["decoded_at"]:
+                                             scan_to_row.append(time.perf_counter() - decoded_at))
+            block = False
+
+    ring = None
+    camera = -1
+    frames_fed = 0
+    ring_full = 0
+    submitted_seq = 0
+    pool.start()
+    start = time.perf_counter()
+    for frame in iter_frames(paths):
+        if ring is None or ring.frames[0].shape != frame.shape:
+            # Each new frame size gets its own ring, treated as a separate camera
+            ring = FrameRing(frame.shape)
+            camera += 1
+            submitted_seq = 0
+
+        index = ring.acquire_write()
+        if index is None:
+            ring_full += 1
+            continue
+        ring.frames[index][...] = frame
+        # Frame times come from the frame count, not the clock, so gating is the same on every run
+        frame_time = frames_fed / (fps or REPLAY_FRAME_RATE)
+        seq = ring.publish(index, frame_time)
+        frames_fed += 1
+        if motion_gate.should_decode(ring.frames[index], frame_time):
+            pool.submit(camera, ring)
+            submitted_seq = seq
+
+        if fps > 0:
+            delay = start + frames_fed / fps - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        else:
+            while submitted_seq and pool.claimed_seq(camera) < submitted_seq:
+                time.sleep(0.0005)
+        ingest_results()
+
+    # Let the workers finish the last frame before stopping them
+    deadline = time.perf_counter() + 2
+    while submitted_seq and pool.claimed_seq(camera) < submitted_seq and time.perf_counter() < deadline:
+        time.sleep(0.001)
+    pool.stop()
+    elapsed = time.perf_counter() - start
+    ingest_results()
+    commit_start = time.perf_counter()
+    session.close()
+    commit_time = time.perf_counter() - commit_start
+
+    frames_decoded = len(pool.decode_latencies)
+    return {
+        "frames_fed": frames_fed,
+        "frames_decoded": frames_decoded,
+        "frames_dropped": pool.dropped_frames + ring_full,
+        "frames_low_quality": pool.low_quality_frames,
+        "elapsed_s": round(elapsed, 3),
+        "feed_fps": round(frames_fed / elapsed, 1) if elapsed else 0.0,
+        "decode_fps": round(frames_decoded / elapsed, 1) if elapsed else 0.0,
+        "decode_latency_ms": percentiles(pool.decode_latencies),
+        "decode_success_rate": round(pool.frames_with_codes / frames_decoded, 3) if frames_decoded else 0.0,
+        "decoded_by_tier": pool.tier_hits,
+        "scans_saved": counts["saved"],
+        "scans_duplicate": counts["duplicate"],
+        "scans_invalid": counts["invalid"],
+        "scans_error": counts["error"],
+        "parts_received": counts["partial"],
+        "scan_to_row_ms": percentiles(scan_to_row),
+        "final_commit_ms": round(commit_time * 1000, 2),
+        "decoder": pool.active_backend,
+        "decoder_benchmark_ms": pool.benchmark,
+        "decoder_benchmark_reads": pool.benchmark_reads,
+        "stages_ms": pipeline_metrics.snapshot(),
+        "output_dir": output_dir,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded frames through the QR scanner pipeline")
+    parser.add_argument("inputs", nargs="+", help="Video files, image files or directories of images")
+    parser.add_argument("--fps", type=float, default=0.0,
+                        help="Feed frames at this rate like a live camera (default: as fast as decoding allows)")
+    parser.add_argument("--output-dir", help="Where scanned rows are saved (default: a new temp directory)")
+    add_pipeline_arguments(parser)
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    settings_from_args(args)
+    output_dir = args.output_dir or tempfile.mkdtemp(prefix="scoutops-replay-")
+    os.makedirs(output_dir, exist_ok=True)
+
+    report = replay(args.inputs, output_dir, args.fps, args.workers, args.decoder)
+    for key, value in report.items():
+        print(f"{key:>22}: {value}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
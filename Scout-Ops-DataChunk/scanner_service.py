@@ -0,0 +1,151 @@
+"""Headless Scout Ops QR scanner service.
+
+Runs the capture -> decode -> parse -> persist core from scanner_core with no
+Qt, for a small single-board computer or a spare laptop. Scans go to the same
+scan store as the scanner window, and results.csv is exported from it on
+shutdown.
+
+    python scanner_service.py --camera 0 --camera 1
+"""
+import argparse
+import queue
+import signal
+import threading
+import time
+
+from scanner_core import (METRICS_FILE, CameraCapture, DecodeWorkerPool, MemoryBudget, ScanSession,
+                          add_pipeline_arguments, load_camera_cache, logging_settings, memory_settings,
+                          metrics_settings, pipeline_metrics, settings_from_args, setup_logging, stop_logging,
+                          TABLET_IDS)
+
+
+def log_status(message, message_type="info"):
+    """Print a timestamped status line, the console counterpart of add_status_message"""
+    timestamp = time.strftime("%H:%M:%S")
+    print(f"[{timestamp}] {message_type.upper()}: {message}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the Scout Ops QR scanner without a window")
+    parser.add_argument("--camera", type=int, action="append",
+                        help="Camera index to scan with, repeat for several cameras "
+                             "(default: the camera the scanner last used)")
+    add_pipeline_arguments(parser)
+    parser.add_argument("--stats-interval", type=float, default=60.0,
+                        help="Seconds between throughput lines, 0 to disable")
+    parser.add_argument("--log-level", default=logging_settings["level"],
+                        help="Level written to the scanner log file (DEBUG, INFO, WARNING, ERROR)")
+    parser.add_argument("--memory-budget", type=int, default=memory_settings["budget_mb"],
+                        help="Resident memory in MB above which in-memory caches are released")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Log the allocation sites that grew at every memory check (slow)")
+    args = parser.parse_args()
+
+    setup_logging(args.log_level)
+    memory_settings["budget_mb"] = args.memory_budget
+    memory_settings["tracemalloc"] = memory_settings["tracemalloc"] or args.trace_memory
+
+    settings_from_args(args)
+    camera_cache = load_camera_cache()
+    last_camera = camera_cache.get("last_camera") if camera_cache else None
+    camera_indices = args.camera or [last_camera if last_camera is not None else 0]
+
+    results = queue.Queue()
+    session = ScanSession(notify=log_status)
+    memory_budget = MemoryBudget()
+    memory_budget.add_release("scan caches", session.release_memory)
+    decoder_pool = DecodeWorkerPool(results.put, args.workers, args.decoder)
+    decoder_pool.start()
+    log_status(f"Decoding with {decoder_pool.resolve_backend()}")
+
+    cameras = []
+    threads = []
+    for camera_index in camera_indices:
+        camera = CameraCapture(camera_index, decoder_pool)
+        thread = threading.Thread(target=camera.run, name=f"camera-{camera_index}", daemon=True)
+        thread.start()
+        cameras.append(camera)
+        threads.append(thread)
+
+    stop_event = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    log_status(f"Scanning with camera {', '.join(map(str, camera_indices))}, saving to {session.store.path}")
+
+    duplicates = 0
+    last_stats = time.monotonic()
+    last_metrics = time.monotonic()
+    last_memory_check = time.monotonic()
+    try:
+        while not stop_event.is_set():
+            try:
+                result = results.get(timeout=0.5)
+            except queue.Empty:
+                result = None
+
+            if result is not None:
+                for event in session.scan_events(result["codes"]):
+                    # A held-up tablet is seen on every frame, only count its duplicates
+                    duplicates += sum(1 for status, _ in event.records if status == "duplicate")
+                    if event.kind == "partial":
+                        log_status(event.message)
+                    elif event.kind == "saved":
+                        scanned_count = len(session.tracker.scanned(session.last_match_key))
+                        log_status(f"{event.message} on camera {result['camera']} "
+                                   f"({session.last_match_key}: {scanned_count}/{len(TABLET_IDS)} tablets)",
+                                   "success")
+
+            if metrics_settings["interval"] > 0 and time.monotonic() - last_metrics >= metrics_settings["interval"]:
+                last_metrics = time.monotonic()
+                pipeline_metrics.write(METRICS_FILE)
+
+            if time.monotonic() - last_memory_check >= memory_settings["check_interval"]:
+                last_memory_check = time.monotonic()
+                memory_budget.check()
+
+            if not any(thread.is_alive() for thread in threads):
+                log_status("All cameras stopped", "error")
+                break
+
+            if args.stats_interval and time.monotonic() - last_stats >= args.stats_interval:
+                last_stats = time.monotonic()
+                for camera in cameras:
+                    scene = "active" if camera.motion_gate.active else "idle"
+                    log_status(f"Camera {camera.camera_index}: capture {camera.capture_rate.rate():.1f} fps, "
+                               f"scene {scene}")
+                log_status(f"Decode {decoder_pool.decode_rate.rate():.1f} fps, "
+                           f"dropped {decoder_pool.dropped_frames}, low quality {decoder_pool.low_quality_frames}, "
+                           f"duplicates {duplicates}")
+                log_status(f"Scan store backlog {session.store.backlog()}, "
+                           f"{session.store.backpressure_events} scans over the queue limit")
+                log_status("Decoded by tier: " + ", ".join(f"{tier} {hits}"
+                                                           for tier, hits in decoder_pool.tier_hits.items()))
+                if memory_budget.rss is not None:
+                    log_status(f"Memory {memory_budget.rss / 1048576:.0f} MB of {memory_settings['budget_mb']} MB, "
+                               f"decode buffers {decoder_pool.buffer_bytes() / 1048576:.1f} MB")
+                outstanding = session.tracker.outstanding()
+                if outstanding:
+                    shown = list(outstanding.items())[:10]
+                    more = f" (+{len(outstanding) - 10} more)" if len(outstanding) > 10 else ""
+                    log_status("Outstanding: " + "; ".join(f"{key} missing {', '.join(tablets)}"
+                                                           for key, tablets in shown) + more)
+    finally:
+        # Stop the cameras and commit queued scans even if the loop failed
+        log_status("Shutting down")
+        for camera in cameras:
+            camera.stop()
+        for thread in threads:
+            thread.join(timeout=2)
+        decoder_pool.stop()
+        try:
+            session.create_match_summary_file()
+        except OSError as e:
+            log_status(f"Could not write the match summary: {e}", "error")
+        session.close()
+        if metrics_settings["interval"] > 0:
+            pipeline_metrics.write(METRICS_FILE)
+        stop_logging()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""Tests for the data-loss paths of scanner_core: the compact codec, multi-part
+assembly, the scan store's spill and recovery, and legacy imports.
+
+    python -m unittest test_scanner_core
+"""
+import csv
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from scanner_core import (PartAssembler, ScanSession, ScanStore, SCAN_FIELDS, base45_decode, base45_encode,
+                          decode_compact, encode_bundle, encode_compact, expand_payload, parse_record,
+                          split_payload)
+
+ROW = ("201,Bob,2025mitry_qm1,Red,2025mitry,1,1,1,2,0,0,True,1,0,null,3,4,0,1,2,0,5,False,True,False,False,"
+       "fast, but dropped coral")
+
+
+def make_row(team="201", station="1", comment="fast, but dropped coral"):
+    values = ROW.split(",", len(SCAN_FIELDS) - 1)
+    values[0], values[5], values[-1] = team, station, comment
+    return ",".join(values)
+
+
+class CompactCodecTest(unittest.TestCase):
+    def test_base45_round_trip(self):
+        for data in (b"", b"\x00", b"\xff\xff", bytes(range(256))):
+            self.assertEqual(base45_decode(base45_encode(data)), data)
+
+    def test_record_round_trip(self):
+        for row in (ROW, make_row(comment=""), make_row(comment="héllo, wörld"), make_row(team="9999")):
+            self.assertEqual(decode_compact(encode_compact(row)), row)
+
+    def test_bundle_round_trip(self):
+        rows = [make_row(station=str(station)) for station in (1, 2, 3)]
+        self.assertEqual(expand_payload(encode_bundle(rows)), rows)
+        self.assertEqual(expand_payload(encode_bundle(rows, compact=False)), rows)
+
+    def test_leading_zeros_are_refused(self):
+        # A varint would turn "0201" into "201", so the row must go as plain CSV
+        with self.assertRaises(ValueError):
+            encode_compact(make_row(team="0201"))
+
+    def test_corrupt_payload_raises(self):
+        payload = encode_compact(ROW)
+        for broken in (payload[:-3], payload[:5] + "a" + payload[6:], "SOC1:"):
+            with self.assertRaises(ValueError):
+                decode_compact(broken)
+
+
+class PartAssemblerTest(unittest.TestCase):
+    def test_parts_in_any_order(self):
+        assembler = PartAssembler()
+        parts = split_payload(ROW, chunk_size=40)
+        self.assertGreater(len(parts), 2)
+        for part in reversed(parts[1:]):
+            self.assertEqual(assembler.add(part)[0], "part")
+        self.assertEqual(assembler.add(parts[-1])[0], "repeat")
+        status, payload, _ = assembler.add(parts[0])
+        self.assertEqual((status, payload), ("complete", ROW))
+        self.assertEqual(assembler.add(parts[0])[0], "repeat")
+        self.assertEqual(assembler.partial, {})
+
+    def test_missing_parts(self):
+        assembler = PartAssembler()
+        parts = split_payload(ROW, chunk_size=40)
+        assembler.add(parts[1])
+        record_id = next(iter(assembler.partial))
+        self.assertEqual(assembler.missing_parts(record_id), [1] + list(range(3, len(parts) + 1)))
+
+    def test_expiry(self):
+        assembler = PartAssembler(expire_seconds=10)
+        parts = split_payload(ROW, chunk_size=40)
+        assembler.add(parts[0])
+        record_id = next(iter(assembler.partial))
+        assembler.expire(time.monotonic() + 5)
+        self.assertIn(record_id, assembler.partial)
+        assembler.expire(time.monotonic() + 11)
+        self.assertNotIn(record_id, assembler.partial)
+
+
+class ScanStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "scans.db")
+        self.settings = {"fsync_policy": "group", "fsync_interval": 1.0, "group_window": 0.0, "queue_limit": 5}
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def entry(self, number):
+        return {"saved_at": "2025-03-01T10:00:00", "tablet": "Red 1", "digest": str(number),
+                "record": parse_record(make_row(team=str(number)))}
+
+    def stored_digests(self):
+        connection = sqlite3.connect(self.path)
+        try:
+            return sorted(int(digest) for digest, in connection.execute("SELECT digest FROM scans"))
+        finally:
+            connection.close()
+
+    def test_spills_while_writes_fail_and_recovers(self):
+        store = ScanStore(self.path, self.settings)
+        original = ScanStore._insert
+        failing = mock.Mock(side_effect=sqlite3.OperationalError("disk I/O error"))
+        with mock.patch.object(ScanStore, "_insert", staticmethod(failing)):
+            store.start()
+            for number in range(20):
+                store.append(self.entry(number))
+                time.sleep(0.01)
+            time.sleep(0.2)
+            self.assertLessEqual(store.backlog(), self.settings["queue_limit"])
+            self.assertTrue(os.path.exists(store.spill_path))
+            self.assertIsNotNone(store.error)
+        self.assertIs(ScanStore._insert, original)
+        store.append(self.entry(20))
+        store.close()
+        self.assertEqual(self.stored_digests(), list(range(21)))
+        self.assertFalse(os.path.exists(store.spill_path))
+
+    def test_spill_is_imported_on_next_start(self):
+        store = ScanStore(self.path, self.settings)
+        store._spill([self.entry(number) for number in range(3)])
+        ScanStore(self.path, self.settings)
+        self.assertEqual(self.stored_digests(), [0, 1, 2])
+        self.assertFalse(os.path.exists(store.spill_path))
+
+
+class LegacyImportTest(unittest.TestCase):
+    def test_rescan_of_imported_row_is_a_duplicate(self):
+        with tempfile.TemporaryDirectory() as directory:
+            results_csv = os.path.join(directory, "results.csv")
+            # results.csv from an older version, the comment's comma already replaced
+            with open(results_csv, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(SCAN_FIELDS)
+                writer.writerow(make_row(comment="fast| but dropped coral").split(","))
+            session = ScanSession(save_dir=directory, results_csv=results_csv,
+                                  store_path=os.path.join(directory, "scans.db"),
+                                  journal_path=os.path.join(directory, "journal.jsonl"))
+            try:
+                self.assertEqual(session.ingest(make_row()), [("duplicate", None)])
+                self.assertEqual(session.ingest(make_row(station="2"))[0][0], "saved")
+            finally:
+                session.close()
+
+
+if __name__ == "__main__":
+    unittest.main()